@@ -0,0 +1,78 @@
+# Compares the browse page extractors in workshop_parse on the saved pages in
+# benchmarks/fixtures. The soup extractor is the full BeautifulSoup html.parser
+# tree the app used to build for every page and is the baseline.
+#
+#   python benchmarks/bench_parse.py [--repeat N]
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workshop_parse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def load_fixtures():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, 'browse_*.html'))):
+        with open(path, 'r', encoding='utf-8') as file:
+            pages.append((os.path.basename(path), file.read()))
+    return pages
+
+def get_extractors():
+    extractors = []
+    try:
+        import bs4
+        extractors.append(('soup (html.parser)', workshop_parse.extract_links_soup))
+    except ImportError:
+        print("bs4 is not installed, skipping the baseline")
+    extractors.append(('stream tokenizer', workshop_parse.extract_links_stream))
+    if workshop_parse.lxml is not None:
+        extractors.append(('lxml', workshop_parse.extract_links_lxml))
+    else:
+        print("lxml is not installed, skipping the lxml fast path")
+    return extractors
+
+def time_extractor(extract, pages, repeat):
+    # Best of several rounds, in seconds per page
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for name, html in pages:
+            extract(html)
+        best = min(best, time.perf_counter() - started)
+    return best / len(pages)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the workshop browse page extractors")
+    parser.add_argument('--repeat', type=int, default=20, help="rounds over the fixture pages")
+    args = parser.parse_args()
+
+    pages = load_fixtures()
+    if not pages:
+        sys.exit(f"No fixture pages found in {FIXTURES_DIR}")
+    extractors = get_extractors()
+
+    # Every extractor must agree before its timing means anything
+    name, extract = extractors[0]
+    expected = [extract(html) for page, html in pages]
+    for other_name, other_extract in extractors[1:]:
+        for (page, html), links in zip(pages, expected):
+            if other_extract(html) != links:
+                sys.exit(f"{other_name} disagrees with {name} on {page}")
+
+    print(f"{len(pages)} pages, {sum(len(links) for links in expected)} links, best of {args.repeat} rounds\n")
+    print(f"{'extractor':<22}{'ms/page':>10}{'speedup':>10}")
+    baseline = None
+    for name, extract in extractors:
+        per_page = time_extractor(extract, pages, args.repeat)
+        if baseline is None:
+            baseline = per_page
+        print(f"{name:<22}{per_page * 1000:>10.2f}{baseline / per_page:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+# Times the app's network workflows end to end against the local stand-in in
+# fake_steam.py, so they run offline under known conditions: game search,
+# link collection, bulk validation, detailed view pages and downloads.
+#
+#   python benchmarks/bench_workflows.py [--latency 0.05] [--throttle-rate 0.02] [--only links,validate]
+#
+# Every run starts from empty caches in a temporary directory and every
+# scenario uses its own items, so none of them is served from the cache of
+# another. Throughput is operations per second over the whole scenario,
+# latency is per operation.
+
+import argparse
+import asyncio
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_steam
+
+SCENARIOS = ('search', 'links', 'validate', 'details', 'downloads')
+
+def percentile(values, share):
+    # Nearest rank, values need not be sorted
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+def get_item_ids(first, count):
+    return [str(fake_steam.FIRST_ITEM_ID + index) for index in range(first, first + count)]
+
+async def timed(awaitable, latencies):
+    started = time.perf_counter()
+    result = await awaitable
+    latencies.append(time.perf_counter() - started)
+    return result
+
+async def bench_search(core, args):
+    session = core.get_session()
+    latencies = []
+    await asyncio.gather(*(timed(core.search_workshop(session, f"game {index}"), latencies) for index in range(args.searches)))
+    return latencies, ""
+
+async def bench_links(core, args):
+    # Latency of a link is the time it took to arrive since the search began
+    session = core.get_session()
+    started = time.perf_counter()
+    appid = await core.search_workshop(session, "links")
+    latencies = []
+    async for link in core.iter_links_from_workshop(session, appid, None, args.links):
+        latencies.append(time.perf_counter() - started)
+    if not latencies:
+        return latencies, "no links"
+    return latencies, f"first link after {latencies[0] * 1000:.0f} ms"
+
+async def bench_validate(core, args):
+    session = core.get_session()
+    latencies = []
+    broken = 0
+    tasks = [timed(core.fetch_workshop_item_details(session, item_id), latencies) for item_id in get_item_ids(0, args.validate)]
+    for finished in asyncio.as_completed(tasks):
+        if not await finished:
+            broken += 1
+    return latencies, f"{broken} broken"
+
+async def bench_details(core, args):
+    try:
+        import work
+    except ImportError as e:
+        return None, f"skipped, the GUI modules do not import: {e}"
+    latencies = []
+    first = args.validate
+    for page in range(args.pages):
+        item_ids = get_item_ids(first + page * args.page_size, args.page_size)
+        await timed(work.fetch_detail_page(item_ids), latencies)
+    if work.image_executor is not None:
+        work.image_executor.shutdown(wait=True)
+    return latencies, f"{args.page_size} items and thumbnails per page"
+
+async def bench_downloads(core, args):
+    from workshop_downloads import DONE, DownloadManager
+
+    session = core.get_session()
+    item_ids = get_item_ids(args.validate + args.pages * args.page_size, args.downloads)
+    details = await asyncio.gather(*(core.fetch_workshop_item_details(session, item_id) for item_id in item_ids))
+
+    latencies = []
+    added = {}
+
+    def finished(job):
+        if job.state == DONE:
+            latencies.append(time.perf_counter() - added[job.job_id])
+
+    manager = DownloadManager(None, args.jobs, on_finished=finished, segments=args.segments, extract=args.extract)
+    await manager.start()
+    started = time.perf_counter()
+    jobs = []
+    for item_id, item_details in zip(item_ids, details):
+        if item_details:
+            job = manager.add(item_details.get('url'), item_details['name'], 0, item_id, 'downloads')
+            added[job.job_id] = time.perf_counter()
+            jobs.append(job)
+    await manager.join()
+    elapsed = time.perf_counter() - started
+    await manager.stop()
+    size = sum(job.total or 0 for job in jobs if job.state == DONE)
+    note = f"{core.format_size(size / elapsed)}/s with {args.jobs} parallel, {args.segments} segments each"
+    extract_seconds = [job.extract_seconds for job in jobs if job.extract_seconds is not None]
+    if extract_seconds:
+        note += f", unpacked in {sum(extract_seconds) / len(extract_seconds):.2f} s on average"
+    return latencies, note
+
+async def run(core, args, scenarios):
+    benchmarks = {
+        'search': bench_search,
+        'links': bench_links,
+        'validate': bench_validate,
+        'details': bench_details,
+        'downloads': bench_downloads
+    }
+    core.scheduler.configure(args.threads)
+    rows = []
+    try:
+        for name in scenarios:
+            started = time.perf_counter()
+            latencies, note = await benchmarks[name](core, args)
+            rows.append((name, latencies, time.perf_counter() - started, note))
+    finally:
+        await core.close_session()
+        core.shutdown_executors()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the workshop workflows against a local stand-in server")
+    parser.add_argument('--only', help="comma separated scenarios out of " + ', '.join(SCENARIOS))
+    parser.add_argument('--threads', type=int, default=8, help="concurrent requests per host")
+    parser.add_argument('--rate', type=float, help="requests per second per host, the app's limit by default")
+    parser.add_argument('--searches', type=int, default=20, help="game searches")
+    parser.add_argument('--links', type=int, default=300, help="links collected from the browse pages")
+    parser.add_argument('--validate', type=int, default=200, help="items validated")
+    parser.add_argument('--pages', type=int, default=5, help="detailed view pages loaded")
+    parser.add_argument('--page-size', type=int, default=9, help="items per detailed view page")
+    parser.add_argument('--downloads', type=int, default=10, help="items downloaded")
+    parser.add_argument('--jobs', type=int, default=2, help="parallel downloads")
+    parser.add_argument('--segments', type=int, default=1, help="connections per download for large files")
+    parser.add_argument('--extract', action='store_true', help="unpack the downloads, with --zip-files")
+    parser.add_argument('--metrics', metavar='FILE', help="also write the app's own metrics as JSON")
+    fake_steam.add_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    metrics_path = os.path.abspath(args.metrics) if args.metrics else None  # Before leaving the current directory
+    fake = fake_steam.from_arguments(args)
+    fake.start_in_thread()
+    workdir = tempfile.mkdtemp(prefix='workshop-bench-')
+    os.chdir(workdir)  # Cache, thumbnails and downloads all go here
+
+    import workshop_core as core
+    from workshop_metrics import metrics
+    core.STEAM_URL, core.STEAM_API_URL, core.GGNTW_URL = fake.urls()
+    if args.rate:
+        core.RATE_LIMIT = args.rate
+        core.RATE_BURST = max(core.RATE_BURST, int(args.rate))
+
+    try:
+        rows = asyncio.run(run(core, args, scenarios))
+    finally:
+        fake.stop_thread()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        shutil.rmtree(workdir, ignore_errors=True)
+    if metrics_path:
+        metrics.write_json(metrics_path)
+
+    print(f"latency {args.latency * 1000:.0f} ms (+{args.jitter * 1000:.0f} ms jitter), "
+          f"{args.error_rate:.0%} errors, {args.throttle_rate:.0%} throttled, "
+          f"{args.threads} per host at {core.RATE_LIMIT:g} requests/s, "
+          f"{fake.requests} requests served, {fake.failures} failed on purpose\n")
+    print(f"{'scenario':<12}{'ops':>6}{'seconds':>10}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}  notes")
+    for name, latencies, elapsed, note in rows:
+        if not latencies:
+            print(f"{name:<12}{'-':>6}{elapsed:>10.2f}{'-':>10}{'-':>10}{'-':>10}  {note}")
+            continue
+        print(
+            f"{name:<12}{len(latencies):>6}{elapsed:>10.2f}{len(latencies) / elapsed:>10.1f}"
+            f"{percentile(latencies, 0.5) * 1000:>10.1f}{percentile(latencies, 0.99) * 1000:>10.1f}  {note}"
+        )
+
+if __name__ == '__main__':
+    main()
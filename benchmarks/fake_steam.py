@@ -0,0 +1,328 @@
+# Local stand-in for steamcommunity.com, api.steampowered.com and
+# api.ggntw.com, serving the endpoints workshop_core uses: ajaxfindworkshops,
+# the workshop browse pages, GetPublishedFileDetails, steam.request and the
+# item downloads and preview images they link to.
+# Latency, failures, 429 throttling, bandwidth and payload sizes are all
+# configurable so the benchmarks can run offline under known conditions.
+#
+#   python benchmarks/fake_steam.py --port 8080 --latency 0.05 --throttle-rate 0.02
+#
+# then start the app against it with
+#
+#   WORKSHOP_STEAM_URL=http://127.0.0.1:8080 WORKSHOP_STEAM_API_URL=http://127.0.0.1:8080 \
+#   WORKSHOP_GGNTW_URL=http://localhost:8080 python work.py
+#
+# Steam and ggntw use different host names so the app keeps a separate request
+# scheduler for each, as it does against the real services. The Steam web API
+# shares one with the community site here.
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import random
+import re
+import threading
+import time
+import zipfile
+
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+EMPTY_PAGE = os.path.join(FIXTURES_DIR, 'browse_page_empty.html')
+NO_ITEMS = re.compile(r'<div id="no_items">.*?</div></div>')
+
+ITEMS_PER_PAGE = 30
+FIRST_ITEM_ID = 1000000000
+APPID = 4000
+SEND_CHUNK = 64 * 1024  # Bytes written per chunk of a download
+
+ITEM_BLOCK = """
+		<div data-panel="{{&quot;type&quot;:&quot;PanelGroup&quot;}}" class="workshopItem">
+			<div class="workshopItemPreviewHolder ">
+				<a data-panel="{{&quot;focusable&quot;:false}}" href="https://steamcommunity.com/sharedfiles/filedetails/?id={item_id}&searchtext={search}" class="ugc" data-appid="{appid}" data-publishedfileid="{item_id}">
+					<div id="sharedfile_{item_id}" class="workshopItemPreviewHolder  "><img class="workshopItemPreviewImage  aspectratio_square" src="{origin}/images/{item_id}.png"></div>
+				</a>
+			</div>
+			<a href="https://steamcommunity.com/sharedfiles/filedetails/?id={item_id}&searchtext={search}" class="item_link"><div class="workshopItemTitle ellipsis">Item {item_id}</div></a>
+		</div>"""
+
+class FakeSteam:
+    def __init__(self, items=3000, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 broken_rate=0.0, file_url_rate=0.0, bandwidth=0, file_size=1024 * 1024, zip_files=0, image_size=512, seed=1):
+        self.items = items  # Items in the workshop, spread over browse pages
+        self.latency = latency  # Seconds added to every response
+        self.jitter = jitter  # Up to this many seconds more, at random
+        self.error_rate = error_rate  # Share of requests answered with a 500
+        self.throttle_rate = throttle_rate  # Share of requests answered with a 429
+        self.broken_rate = broken_rate  # Share of items neither API knows anything about
+        self.file_url_rate = file_url_rate  # Share of items GetPublishedFileDetails has a file_url for
+        self.bandwidth = bandwidth  # Bytes per second per connection, 0 for no cap
+        self.file_size = file_size  # Rounded to the archive's size with zip_files
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        with open(EMPTY_PAGE, 'r', encoding='utf-8') as file:
+            self.page_template = file.read()
+        if zip_files:
+            # Every download is the same archive, served whole
+            self.payload = make_archive(file_size, zip_files)
+            self.file_size = len(self.payload)
+        else:
+            self.payload = os.urandom(min(file_size, 1024 * 1024))
+        self.digest = get_digest(self.payload, self.file_size)
+        self.image = make_image(image_size)
+        self.runner = None
+        self.port = None
+        self.loop = None  # Set by start_in_thread
+        self.thread = None
+
+    def get_app(self):
+        app = web.Application(middlewares=[self.conditions])
+        app.router.add_get('/workshop/ajaxfindworkshops/', self.find_workshops)
+        app.router.add_get('/workshop/browse/', self.browse)
+        app.router.add_post('/ISteamRemoteStorage/GetPublishedFileDetails/v1/', self.published_file_details)
+        app.router.add_post('/steam.request', self.steam_request)
+        app.router.add_get('/images/{item_id}.png', self.preview_image)
+        app.router.add_get('/files/{item_id}.zip', self.download)
+        return app
+
+    @web.middleware
+    async def conditions(self, request, handler):
+        self.requests += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            self.failures += 1
+            return web.Response(status=429, headers={'Retry-After': '1'})
+        if roll < self.throttle_rate + self.error_rate:
+            self.failures += 1
+            return web.Response(status=500)
+        return await handler(request)
+
+    def is_broken(self, item_id):
+        # Stable per item, so a broken item stays broken on every request
+        return random.Random(item_id).random() < self.broken_rate
+
+    async def find_workshops(self, request):
+        search_text = request.query.get('searchText', '')
+        if not search_text:
+            return web.json_response([])
+        return web.json_response([{'appid': APPID, 'name': search_text}])
+
+    async def browse(self, request):
+        page = max(1, int(request.query.get('p', '1')))
+        search = request.query.get('searchtext', '')
+        first = (page - 1) * ITEMS_PER_PAGE
+        blocks = [
+            ITEM_BLOCK.format(item_id=FIRST_ITEM_ID + index, search=search, appid=APPID, origin=get_origin(request))
+            for index in range(first, min(first + ITEMS_PER_PAGE, self.items))
+        ]
+        html = self.page_template
+        if blocks:
+            html = NO_ITEMS.sub(lambda match: ''.join(blocks), html, count=1)
+        return web.Response(text=html, content_type='text/html')
+
+    async def published_file_details(self, request):
+        form = await request.post()
+        origin = get_origin(request)
+        details = []
+        for index in range(int(form.get('itemcount', 0))):
+            item_id = form.get(f'publishedfileids[{index}]', '')
+            if not item_id.isdigit() or self.is_broken(int(item_id)):
+                details.append({'publishedfileid': item_id, 'result': 9})
+                continue
+            has_file_url = random.Random(-int(item_id)).random() < self.file_url_rate
+            details.append({
+                'publishedfileid': item_id,
+                'result': 1,
+                'consumer_app_id': APPID,
+                'title': f"Item {item_id}",
+                'file_size': str(self.file_size),
+                'file_url': f"{origin}/files/{item_id}.zip" if has_file_url else '',
+                'preview_url': f"{origin}/images/{item_id}.png",
+                'time_updated': 1600000000 + int(item_id) % 100000000
+            })
+        return web.json_response({'response': {'result': 1, 'resultcount': len(details), 'publishedfiledetails': details}})
+
+    async def steam_request(self, request):
+        data = await request.json()
+        match = re.search(r'id=([0-9]+)', data.get('url', ''))
+        if not match or self.is_broken(int(match.group(1))):
+            return web.json_response({'error': 'Item not found'})
+        item_id = match.group(1)
+        origin = get_origin(request)
+        return web.json_response({
+            'name': f"Item {item_id}",
+            'size': f"{self.file_size / (1024 * 1024):.2f} MB",
+            'update': time.strftime("%d %b, %Y @ %I:%M%p", time.localtime(1600000000 + int(item_id) % 100000000)),
+            'image': f"{origin}/images/{item_id}.png",
+            'url': f"{origin}/files/{item_id}.zip"
+        })
+
+    async def preview_image(self, request):
+        return web.Response(body=self.image, content_type='image/png')
+
+    async def download(self, request):
+        # The sha-256 of the whole file, as a CDN might send it along
+        headers = {'Content-Type': 'application/zip', 'Accept-Ranges': 'bytes', 'Repr-Digest': f"sha-256=:{self.digest}:"}
+        if request.method == 'HEAD':
+            return web.Response(headers={**headers, 'Content-Length': str(self.file_size)})
+        start = 0
+        end = self.file_size  # Exclusive
+        match = re.match(r'bytes=([0-9]+)-([0-9]*)', request.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(end, int(match.group(2)) + 1)
+            if start >= end:
+                return web.Response(status=416, headers={'Content-Range': f"bytes */{self.file_size}"})
+        response = web.StreamResponse(status=206 if match else 200, headers=headers)
+        response.content_length = end - start
+        if match:
+            response.headers['Content-Range'] = f"bytes {start}-{end - 1}/{self.file_size}"
+        await response.prepare(request)
+
+        # Each connection gets the bandwidth on its own, like a CDN limiting
+        # per stream rather than per client
+        started = time.monotonic()
+        sent = 0
+        position = start
+        while position < end:
+            offset = position % len(self.payload)
+            chunk = self.payload[offset:offset + min(SEND_CHUNK, end - position)]
+            try:
+                await response.write(chunk)
+            except ConnectionResetError:
+                return response  # Paused or cancelled by the client
+            position += len(chunk)
+            sent += len(chunk)
+            if self.bandwidth:
+                ahead = sent / self.bandwidth - (time.monotonic() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+        await response.write_eof()
+        return response
+
+    async def start(self, host='127.0.0.1', port=0):
+        # localhost in the ggntw URL falls back to 127.0.0.1 where it
+        # resolves to ::1 first
+        self.runner = web.AppRunner(self.get_app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+        return self.port
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        # Runs the server on its own loop so it does not share one with the
+        # code being measured. Returns the port once it is listening.
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start(host, port))
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.stop())
+            loop.close()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+        self.loop = loop
+        return self.port
+
+    def stop_thread(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def urls(self):
+        # Base URLs for workshop_core.STEAM_URL, STEAM_API_URL and GGNTW_URL
+        return f"http://127.0.0.1:{self.port}", f"http://127.0.0.1:{self.port}", f"http://localhost:{self.port}"
+
+def get_origin(request):
+    return f"{request.scheme}://{request.host}"
+
+def make_image(size):
+    try:
+        from PIL import Image
+    except ImportError:
+        # A 1x1 PNG when Pillow is missing, thumbnails then cost almost nothing
+        return bytes.fromhex(
+            '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+            '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082'
+        )
+    noise = os.urandom(size * size * 3)
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (size, size), noise).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def get_digest(payload, size):
+    # Base64 sha-256 of size bytes of payload repeated
+    digest = hashlib.sha256()
+    for start in range(0, size, len(payload)):
+        digest.update(payload[:min(len(payload), size - start)])
+    return base64.b64encode(digest.digest()).decode('ascii')
+
+def make_archive(size, files):
+    # A zip of files text files coming to about size bytes once compressed,
+    # base64 text deflates to roughly three quarters like a mix of assets
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for index in range(files):
+            content = base64.b64encode(os.urandom(max(1, size // files)))
+            archive.writestr(f"item/part{index // 10}/file{index}.txt", content)
+    return buffer.getvalue()
+
+def add_arguments(parser):
+    parser.add_argument('--items', type=int, default=3000, help="items in the fake workshop")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many random seconds more")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument('--broken-rate', type=float, default=0.0, help="share of items with no details")
+    parser.add_argument('--file-url-rate', type=float, default=0.0, help="share of items the Steam API has a download link for")
+    parser.add_argument('--bandwidth', type=int, default=0, help="bytes per second per connection, 0 for unlimited")
+    parser.add_argument('--file-size', type=int, default=1024 * 1024, help="bytes in every download")
+    parser.add_argument('--zip-files', type=int, default=0, help="serve downloads as a zip of this many files")
+    parser.add_argument('--image-size', type=int, default=512, help="width and height of preview images")
+
+def from_arguments(args):
+    return FakeSteam(
+        items=args.items, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, broken_rate=args.broken_rate, file_url_rate=args.file_url_rate, bandwidth=args.bandwidth,
+        file_size=args.file_size, zip_files=args.zip_files, image_size=args.image_size
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for Steam and the ggntw API")
+    parser.add_argument('--port', type=int, default=8080)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    fake = from_arguments(args)
+
+    async def serve():
+        await fake.start(port=args.port)
+        steam_url, steam_api_url, ggntw_url = fake.urls()
+        print(f"WORKSHOP_STEAM_URL={steam_url} WORKSHOP_STEAM_API_URL={steam_api_url} WORKSHOP_GGNTW_URL={ggntw_url}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
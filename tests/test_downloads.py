@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workshop_core import DownloadResult
+from workshop_downloads import DONE, PAUSED, QUEUED, RUNNING, DownloadManager
+
+class SlowStopManager(DownloadManager):
+    # Downloads take a moment to stop when cancelled, like a real transfer
+    # closing its file and connection
+    def __init__(self, *args, **kwargs):
+        super().__init__(None, *args, **kwargs)
+        self.release = asyncio.Event()
+        self.started = []
+
+    async def download(self, job):
+        self.started.append(job.job_id)
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.05)
+            raise
+        return DownloadResult(f"{job.name}.zip", 1, 1.0, 'hash')
+
+async def wait_for_state(job, state):
+    while job.state != state:
+        await asyncio.sleep(0.01)
+
+class DownloadManagerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.manager = SlowStopManager(workers=2)
+        await self.manager.start()
+
+    async def asyncTearDown(self):
+        await self.manager.stop()
+
+    async def finish(self):
+        self.manager.release.set()
+        await asyncio.wait_for(self.manager.join(), 2)
+
+    async def test_runs_jobs(self):
+        jobs = [self.manager.add(None, f"item{index}") for index in range(3)]
+        await self.finish()
+        self.assertEqual([job.state for job in jobs], [DONE] * 3)
+
+    async def test_resume_while_stopping(self):
+        job = self.manager.add(None, 'item')
+        await asyncio.wait_for(wait_for_state(job, RUNNING), 2)
+        self.manager.pause(job.job_id)
+        self.manager.resume(job.job_id)
+        self.assertEqual(job.state, QUEUED)
+        await asyncio.sleep(0.1)  # The old download has stopped by now
+        self.assertEqual(job.state, RUNNING)
+        await self.finish()
+        self.assertEqual(job.state, DONE)
+        self.assertEqual(self.manager.started, [job.job_id, job.job_id])
+        self.assertTrue(all(not task.done() for task in self.manager.tasks))
+
+    async def test_pause_all_resume_all(self):
+        jobs = [self.manager.add(None, f"item{index}") for index in range(4)]
+        await asyncio.wait_for(wait_for_state(jobs[1], RUNNING), 2)
+        self.manager.pause_all()
+        self.assertEqual({job.state for job in jobs}, {PAUSED})
+        self.manager.resume_all()
+        await self.finish()
+        self.assertEqual([job.state for job in jobs], [DONE] * 4)
+        self.assertEqual(self.manager.running_workers, 2)
+
+    async def test_pause_again_while_stopping(self):
+        job = self.manager.add(None, 'item')
+        await asyncio.wait_for(wait_for_state(job, RUNNING), 2)
+        self.manager.pause(job.job_id)
+        self.manager.resume(job.job_id)
+        self.manager.pause(job.job_id)
+        await asyncio.sleep(0.1)
+        self.assertEqual(job.state, PAUSED)
+        self.assertEqual(self.manager.started, [job.job_id])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workshop_extract import ExtractError, extract_archive, get_member_path
+
+class MemberPathTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.root = self.temp.name
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def test_plain_names_stay_under_root(self):
+        self.assertEqual(get_member_path(self.root, 'a/b.txt'), os.path.join(self.root, 'a', 'b.txt'))
+        self.assertEqual(get_member_path(self.root, './a//b.txt'), os.path.join(self.root, 'a', 'b.txt'))
+        self.assertEqual(get_member_path(self.root, 'a\\b.txt'), os.path.join(self.root, 'a', 'b.txt'))
+
+    def test_parent_directories_are_refused(self):
+        for name in ('../evil.txt', 'a/../../evil.txt', 'a/..', '..\\evil.txt', 'a\\..\\..\\evil.txt'):
+            self.assertIsNone(get_member_path(self.root, name), name)
+
+    def test_absolute_paths_are_refused(self):
+        for name in ('/etc/passwd', '\\Windows\\evil.dll', '//server/share/evil.txt', '\\\\server\\share\\evil.txt'):
+            self.assertIsNone(get_member_path(self.root, name), name)
+
+    def test_drive_letters_and_streams_are_refused(self):
+        for name in ('C:evil.txt', 'C:/Windows/evil.dll', 'C:\\Windows\\evil.dll', 'a/C:evil.txt', 'a/b.txt:stream'):
+            self.assertIsNone(get_member_path(self.root, name), name)
+
+    def test_empty_names_are_refused(self):
+        for name in ('', '/', '.', './/'):
+            self.assertIsNone(get_member_path(self.root, name), name)
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), "needs symbolic links")
+    def test_symlinks_out_of_root_are_refused(self):
+        outside = tempfile.TemporaryDirectory()
+        self.addCleanup(outside.cleanup)
+        os.symlink(outside.name, os.path.join(self.root, 'link'))
+        self.assertIsNone(get_member_path(self.root, 'link/evil.txt'))
+
+class ExtractArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.archive_path = os.path.join(self.temp.name, 'item.zip')
+        self.target = os.path.join(self.temp.name, 'item')
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def write_archive(self, entries):
+        with zipfile.ZipFile(self.archive_path, 'w') as archive:
+            for name, data in entries.items():
+                archive.writestr(name, data)
+
+    def test_extracts_into_target(self):
+        self.write_archive({'a.txt': b'a', 'sub/b.txt': b'bb'})
+        result = extract_archive(self.archive_path, self.target)
+        self.assertEqual((result.files, result.size), (2, 3))
+        with open(os.path.join(self.target, 'sub', 'b.txt'), 'rb') as file:
+            self.assertEqual(file.read(), b'bb')
+
+    def test_entry_outside_target_fails_without_writing(self):
+        self.write_archive({'a.txt': b'a', '../evil.txt': b'evil'})
+        with self.assertRaises(ExtractError):
+            extract_archive(self.archive_path, self.target)
+        self.assertEqual(sorted(os.listdir(self.temp.name)), ['item.zip'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,29 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+from tkinter import font as tkfont
 from tkinter.scrolledtext import ScrolledText
-import aiohttp
 import asyncio
 import threading
-from bs4 import BeautifulSoup
+import queue
 from PIL import Image, ImageTk
 import io
-import re
 import os
+import sys
+import time
+import hashlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 import locale
+import aiohttp
+
+from workshop_core import (
+    SETTINGS_FILE, close_session, fetch_workshop_item_details, fetch_workshop_item_id, format_size,
+    get_download_directory, get_item_url, get_session, iter_links_from_workshop, metadata_cache, read_settings, scheduler,
+    search_workshop, shutdown_executors, write_settings
+)
+from workshop_downloads import DONE, DOWNLOADS_FILE, EXTRACTING, FAILED, PAUSED, QUEUED, RUNNING, WAITING, DownloadManager
+from workshop_metrics import METRICS_FILE, PROFILE_DIR, PROMETHEUS_FILE, metrics
+from workshop_store import SORT_FOUND, SORT_SIZE, SORT_UPDATE, ResultStore
 
 # Set the locale to a default value
 try:
@@ -24,13 +38,34 @@ from ttkbootstrap.scrolled import ScrolledFrame
 
 # Define global variables
 problematic_links = []
-current_page = 0
 num_threads = 1
 num_links_to_fetch = 10
 num_models_to_show = 9  # Default number of models to show
 download_directory = ""  # Default download directory
-
-SETTINGS_FILE = 'settings.txt'
+max_downloads = 2  # Downloads running at the same time
+download_segments = 4  # Connections per download for large files
+extract_downloads = False  # Unpack finished .zip downloads into a folder per item
+links_version = 0  # Bumped whenever a new search replaces the results
+check_running = False
+results = ResultStore()  # Search results, shown through results_list
+filter_after_id = None
+detail_view = None  # The detailed view window once opened, hidden when closed
+
+THUMBNAIL_CACHE_DIR = 'thumbnails'  # Resized thumbnails, keyed by image URL and size
+THUMBNAIL_SIZE = (150, 150)
+DETAIL_COLUMNS = 3  # Items per row in the detailed view
+DETAIL_PAGE_CACHE = 8  # Detailed view pages kept with their images
+DETAIL_PREFETCH_PAGES = 1  # Pages fetched ahead of and behind the one shown
+IMAGE_WORKERS = os.cpu_count() or 4  # Threads decoding and resizing thumbnails
+
+UI_FRAME_MS = 16  # Milliseconds between passes applying queued UI updates
+UI_FRAME_BUDGET = 0.008  # Seconds of each pass spent applying updates
+UI_MAX_PULL = 5000  # Queued updates merged in one pass at most
+RESULTS_FLUSH_INTERVAL = 0.1  # Seconds between batches of search or check results handed to the UI
+FILTER_DELAY_MS = 200  # Milliseconds of no typing before the filter is applied
+SORT_LABELS = {"Found order": SORT_FOUND, "Size": SORT_SIZE, "Last updated": SORT_UPDATE}
+CHECK_FAILED_COLOR = '#e74c3c'  # Row colour of a link that failed the check
+DOWNLOADS_REFRESH_MS = 500  # Milliseconds between download queue status updates
 
 # Initialize and start the asyncio event loop in a separate thread
 loop = asyncio.new_event_loop()
@@ -40,227 +75,585 @@ def start_event_loop(loop):
     loop.run_forever()
 
 loop_thread = threading.Thread(target=start_event_loop, args=(loop,), daemon=True)
-loop_thread.start()
 
-def load_settings():
-    global num_threads, num_links_to_fetch, num_models_to_show, download_directory
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r') as file:
-            lines = file.readlines()
-            if len(lines) >= 4:
-                num_threads = int(lines[0].strip())
-                num_links_to_fetch = int(lines[1].strip())
-                num_models_to_show = int(lines[2].strip())
-                download_directory = lines[3].strip()
-            else:
-                save_settings_to_file()  # Save default settings if file is incomplete
+image_executor = None
+downloads_window = None  # Open download queue window, refreshed with the status label
 
-def save_settings_to_file():
-    with open(SETTINGS_FILE, 'w') as file:
-        file.write(f"{num_threads}\n")
-        file.write(f"{num_links_to_fetch}\n")
-        file.write(f"{num_models_to_show}\n")
-        file.write(f"{download_directory}\n")
-
-async def search_workshop(session, search_text):
-    search_url = f"https://steamcommunity.com/workshop/ajaxfindworkshops/?searchText={search_text}"
-    async with session.get(search_url) as response:
-        if response.status == 200:
-            data = await response.json()
-            if data:
-                appid = data[0]['appid']
-                return appid
-    return None
-
-async def get_links_from_workshop(session, appid, search_term=None):
-    links = []
-    for page in range(1, (num_links_to_fetch // 30) + 2):  # 30 links per page
-        browse_url = f"https://steamcommunity.com/workshop/browse/?appid={appid}&p={page}"
-        if search_term:
-            browse_url += f"&searchtext={search_term}"
-        browse_url += "&childpublishedfileid=0&browsesort=textsearch&section=&actualsort=textsearch"
-
-        async with session.get(browse_url) as response:
-            if response.status == 200:
-                page_source = await response.text()
-                soup = BeautifulSoup(page_source, 'html.parser')
-                workshop_div = soup.find('div', class_='workshopBrowseItems')
-                if workshop_div:
-                    links.extend([div.find('a')['href'] for div in workshop_div.find_all('div', attrs={'data-panel': True})])
-                if len(links) >= num_links_to_fetch:
-                    break
-    return links[:num_links_to_fetch]
-
-async def fetch_workshop_item_details(session, item_id):
-    base_url = "https://steamcommunity.com/sharedfiles/filedetails/?id="
-    url = base_url + item_id
-    async with session.post(
-        "https://api.ggntw.com/steam.request",
-        json={"url": url},
-        headers={
-            "Content-Type": "application/json",
-            "User-Agent": "insomnia/2023.5.8"
-        }
-    ) as response:
-        if response.status == 200:
-            response_data = await response.json()
-            if 'url' in response_data:
-                return response_data
-    return None
-
-async def download_workshop_item(session, download_url, item_name):
-    global download_directory
-    async with session.get(download_url) as response:
-        if response.status == 200:
-            # Remove or replace invalid characters
-            item_name = re.sub(r'[<>:"/\\|?*]', '_', item_name)
-            
-            if '.' not in item_name:
-                content_type = response.headers.get('Content-Type')
-                if content_type == 'application/zip':
-                    item_name += '.zip'
-                elif content_type == 'application/octet-stream':
-                    item_name += '.bin'
-                else:
-                    item_name += '.dat'
-            
-            # Determine the download path
-            if download_directory:
-                download_path = os.path.join(download_directory, item_name)
-            else:
-                # Set default to user's Downloads directory if not set
-                download_path = os.path.join(os.path.expanduser("~"), "Downloads", item_name)
-            
-            # Ensure the download directory exists
-            os.makedirs(os.path.dirname(download_path), exist_ok=True)
+class UIDispatcher:
+    # Tk widgets may only be touched from the Tk thread. Code on the loop
+    # thread queues its UI updates here and the Tk thread applies them every
+    # frame. Between two queued calls, all config calls on a widget become one.
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.backlog = deque()  # Merged updates not yet applied
+        self.root = None
 
+    def start(self, root):
+        self.root = root
+        root.after(UI_FRAME_MS, self.drain)
+
+    def call(self, func, *args, **kwargs):
+        self.queue.put(('call', func, (args, kwargs)))
+
+    def config(self, widget, **options):
+        self.queue.put(('config', widget, options))
+
+    def pull(self):
+        merged = {}  # Widget -> config update in the backlog since the last call
+        for _ in range(UI_MAX_PULL):
             try:
-                with open(download_path, 'wb') as file:
-                    file.write(await response.read())
-                show_toast("Success", f"Downloaded {item_name} successfully!")
-            except PermissionError:
-                show_toast("Error", f"Permission denied: Cannot write to {download_path}.", icon="error")
-            except Exception as e:
-                show_toast("Error", f"Failed to save {item_name}: {e}", icon="error")
+                kind, target, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'call':
+                merged.clear()  # Calls may depend on everything queued before them
+                self.backlog.append((kind, target, payload))
+            elif id(target) in merged:
+                merged[id(target)][2].update(payload)
+            else:
+                update = (kind, target, payload)
+                merged[id(target)] = update
+                self.backlog.append(update)
+
+    def drain(self):
+        # A failing update is reported and skipped, it must neither drop the
+        # rest of the backlog nor stop the next frame from being scheduled
+        try:
+            deadline = time.perf_counter() + UI_FRAME_BUDGET
+            self.pull()
+            while self.backlog and time.perf_counter() < deadline:
+                kind, target, payload = self.backlog.popleft()
+                try:
+                    if kind == 'config':
+                        target.config(**payload)
+                    else:
+                        target(*payload[0], **payload[1])
+                except tk.TclError:
+                    pass  # The widget was destroyed while the update was queued
+                except Exception:
+                    self.root.report_callback_exception(*sys.exc_info())
+        finally:
+            self.root.after(UI_FRAME_MS, self.drain)
+
+ui = UIDispatcher()
+
+class VirtualListbox(ttkb.Frame):
+    # Listbox over the view of a ResultStore that only holds the rows on
+    # screen. The scrollbar follows the row count of the view, so scrolling
+    # through 100k results only ever redraws one screenful.
+    def __init__(self, master, store, **listbox_options):
+        super().__init__(master)
+        self.store = store
+        self.failed = set()  # Item ids drawn in CHECK_FAILED_COLOR
+        self.selected = set()  # Selected item ids, kept while their rows scroll out of view
+        self.shown = []  # Item ids of the rows in the listbox
+        self.top = 0  # Index in the view of the first row shown
+        self.refresh_pending = False
+
+        self.listbox = tk.Listbox(self, activestyle='none', exportselection=False, selectmode=tk.EXTENDED, **listbox_options)
+        self.scrollbar = ttkb.Scrollbar(self, orient=VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side='right', fill='y')
+        self.listbox.pack(side='left', fill='both', expand=True)
+        self.row_height = tkfont.Font(font=self.listbox.cget('font')).metrics('linespace') + 1
+
+        self.listbox.bind('<Configure>', lambda event: self.schedule_refresh())
+        self.listbox.bind('<<ListboxSelect>>', self.on_select)
+        self.listbox.bind('<MouseWheel>', lambda event: self.scroll(-3 if event.delta > 0 else 3))
+        self.listbox.bind('<Button-4>', lambda event: self.scroll(-3))
+        self.listbox.bind('<Button-5>', lambda event: self.scroll(3))
+        self.listbox.bind('<Prior>', lambda event: self.scroll(-self.visible_rows()))
+        self.listbox.bind('<Next>', lambda event: self.scroll(self.visible_rows()))
+
+    def visible_rows(self):
+        return max(1, self.listbox.winfo_height() // self.row_height)
+
+    def scroll(self, rows):
+        self.top += rows
+        self.refresh()
+        return 'break'
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.top = int(float(amount) * len(self.store.view))
+        elif unit == 'pages':
+            self.top += int(amount) * self.visible_rows()
+        else:
+            self.top += int(amount)
+        self.refresh()
+
+    def on_select(self, event):
+        selection = set(self.listbox.curselection())
+        for offset, item_id in enumerate(self.shown):
+            if offset in selection:
+                self.selected.add(item_id)
+            else:
+                self.selected.discard(item_id)
+
+    def selected_ids(self):
+        return [item_id for item_id in self.store.view if item_id in self.selected] if self.selected else []
+
+    def schedule_refresh(self):
+        # Redraws requested while results stream in become one
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.after_idle(self.refresh)
+
+    def refresh(self):
+        self.refresh_pending = False
+        count = len(self.store.view)
+        rows = self.visible_rows()
+        self.top = max(0, min(self.top, count - rows))
+        end = min(count, self.top + rows)
+        self.shown = []
+        texts = []
+        for index in range(self.top, end):
+            item_id, text = self.store.row(index)
+            self.shown.append(item_id)
+            texts.append(text)
+        self.listbox.delete(0, tk.END)
+        if texts:
+            self.listbox.insert(tk.END, *texts)
+        for offset, item_id in enumerate(self.shown):
+            if item_id in self.failed:
+                self.listbox.itemconfig(offset, fg=CHECK_FAILED_COLOR)
+            if item_id in self.selected:
+                self.listbox.selection_set(offset)
+        if count:
+            self.scrollbar.set(self.top / count, end / count)
         else:
-            show_toast("Error", f"Failed to download {item_name}", icon="error")
+            self.scrollbar.set(0, 1)
+
+def shutdown_event_loop():
+    try:
+        # Running downloads keep their .part files and resume on the next launch
+        asyncio.run_coroutine_threadsafe(download_manager.stop(), loop).result(timeout=5)
+    except Exception:
+        pass
+    try:
+        asyncio.run_coroutine_threadsafe(close_session(), loop).result(timeout=5)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+    shutdown_executors()
+    if image_executor is not None:
+        image_executor.shutdown(wait=False, cancel_futures=True)
 
-def download_button_clicked(url, name):
-    asyncio.run_coroutine_threadsafe(download_workshop_item_wrapper(url, name), loop)
+def load_settings():
+    global num_threads, num_links_to_fetch, num_models_to_show, download_directory, max_downloads, download_segments
+    global extract_downloads
+    settings = read_settings()
+    if settings:
+        num_threads = settings['num_threads']
+        num_links_to_fetch = settings['num_links_to_fetch']
+        num_models_to_show = settings['num_models_to_show']
+        download_directory = settings['download_directory']
+        max_downloads = settings['max_downloads']
+        download_segments = settings['download_segments']
+        extract_downloads = settings['extract_downloads']
+    elif os.path.exists(SETTINGS_FILE):
+        save_settings_to_file()  # Save default settings if file is incomplete
 
-async def download_workshop_item_wrapper(url, name):
-    async with aiohttp.ClientSession() as session:
-        await download_workshop_item(session, url, name)
+def save_settings_to_file():
+    write_settings({
+        'num_threads': num_threads,
+        'num_links_to_fetch': num_links_to_fetch,
+        'num_models_to_show': num_models_to_show,
+        'download_directory': download_directory,
+        'max_downloads': max_downloads,
+        'download_segments': download_segments,
+        'extract_downloads': extract_downloads
+    })
+
+def get_image_executor():
+    global image_executor
+    if image_executor is None:
+        image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS)
+    return image_executor
+
+def get_thumbnail_path(url, size):
+    key = hashlib.sha1(f"{url}|{size[0]}x{size[1]}".encode('utf-8')).hexdigest()
+    return os.path.join(THUMBNAIL_CACHE_DIR, key + '.png')
+
+def load_thumbnail(cache_path):
+    img = Image.open(cache_path)
+    img.load()
+    return img
+
+def make_thumbnail(data, size, cache_path):
+    # Runs in the image pool, PIL releases the GIL while decoding and resampling
+    with metrics.timer('image_decode_seconds'):
+        img = Image.open(io.BytesIO(data))
+        if img.format == 'JPEG':
+            # Let the decoder scale down by up to 8x instead of decoding full size
+            img.draft('RGB', size)
+        img.load()
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA')
+    with metrics.timer('image_resize_seconds'):
+        img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+    try:
+        os.makedirs(THUMBNAIL_CACHE_DIR, exist_ok=True)
+        temp_path = cache_path + '.tmp'
+        with metrics.timer('thumbnail_write_seconds'):
+            img.save(temp_path, 'PNG')
+            os.replace(temp_path, cache_path)
+    except OSError:
+        pass  # The thumbnail is still usable without the disk cache
+    return img
+
+async def fetch_thumbnail(session, url, size=THUMBNAIL_SIZE):
+    running_loop = asyncio.get_running_loop()
+    executor = get_image_executor()
+    cache_path = get_thumbnail_path(url, size)
+    if os.path.exists(cache_path):
+        try:
+            return await running_loop.run_in_executor(executor, load_thumbnail, cache_path)
+        except OSError:
+            pass
+    try:
+        async with scheduler.request(session, 'GET', url) as response:
+            if response.status != 200:
+                return None
+            data = await response.read()
+        return await running_loop.run_in_executor(executor, make_thumbnail, data, size, cache_path)
+    except Exception:
+        return None
+
+def download_button_clicked(url, name, item_id=None):
+    loop.call_soon_threadsafe(download_manager.add, url, name, 0, item_id, download_directory)
+    show_toast("Queued", f"{name} added to the download queue.")
+
+def download_finished(job):
+    # Called on the loop thread by the download manager
+    if job.state == DONE and job.skipped:
+        show_toast("Up to Date", f"{job.name} has not changed since {os.path.basename(job.path)} was downloaded.")
+    elif job.state == DONE and job.extract_seconds is not None:
+        show_toast("Success", f"Downloaded and extracted {os.path.basename(job.extracted)} ({format_size(job.rate)}/s, unpacked in {job.extract_seconds:.1f} s)")
+    elif job.state == DONE:
+        show_toast("Success", f"Downloaded {os.path.basename(job.path)} successfully! ({format_size(job.rate)}/s)")
+    else:
+        show_toast("Error", f"Failed to download {job.name}: {job.error}", icon="error")
 
-def show_detailed_view(page=0):
-    global current_page, num_models_to_show
-    current_page = page
-    selected_items = listbox_links.get(0, tk.END)
+download_manager = DownloadManager(DOWNLOADS_FILE, max_downloads, on_finished=download_finished)
+
+def sync_downloads():
+    # Checks every item downloaded into the download directory for updates
+    async def sync():
+        try:
+            jobs = await download_manager.sync(None, download_directory)
+        except Exception as e:
+            show_toast("Error", f"Failed to sync {get_download_directory(download_directory)}: {e}", icon="error")
+            return
+        show_toast("Sync", f"{len(jobs)} updated items queued." if jobs else "Every downloaded item is up to date.")
+
+    asyncio.run_coroutine_threadsafe(sync(), loop)
+
+def refresh_downloads():
+    # Polls the manager on the loop thread, the snapshot is applied on the Tk thread
+    loop.call_soon_threadsafe(lambda: ui.call(apply_downloads, *download_manager.snapshot()))
+    root.after(DOWNLOADS_REFRESH_MS, refresh_downloads)
+
+def apply_downloads(jobs, throughput):
+    running = sum(1 for job in jobs if job['state'] in (RUNNING, EXTRACTING))
+    queued = sum(1 for job in jobs if job['state'] in (QUEUED, WAITING))
+    if running or queued:
+        label_download_status.config(text=f"Downloads: {running} running, {queued} queued ({format_size(throughput)}/s)")
+    else:
+        label_download_status.config(text="")
+    if downloads_window is not None:
+        downloads_window.update_jobs(jobs, throughput)
+
+def format_progress(job):
+    if job['state'] == DONE:
+        return format_size(job['total'] or job['downloaded'])
+    if job['total']:
+        return f"{format_size(job['downloaded'])} / {format_size(job['total'])} ({job['downloaded'] * 100 // job['total']}%)"
+    if job['downloaded']:
+        return format_size(job['downloaded'])
+    return ""
+
+def show_downloads():
+    global downloads_window
+    if downloads_window is not None:
+        downloads_window.window.lift()
+        return
+    downloads_window = DownloadsWindow(root)
+
+class DownloadsWindow:
+    # The rows are keyed by job id so every refresh only touches changed values
+    COLUMNS = ('name', 'state', 'progress', 'speed', 'priority')
+
+    def __init__(self, master):
+        self.window = ttkb.Toplevel(master)
+        self.window.title("Downloads")
+        self.window.geometry("900x400")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.rows = {}
+
+        self.tree = ttkb.Treeview(self.window, columns=self.COLUMNS, show='headings', selectmode='extended')
+        for column, heading, width in zip(self.COLUMNS, ("Name", "State", "Progress", "Speed", "Priority"), (300, 80, 200, 100, 70)):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor='w')
+        self.tree.pack(fill='both', expand=True, padx=10, pady=10)
+
+        buttons = ttkb.Frame(self.window)
+        buttons.pack(fill='x', padx=10)
+        for text, command, style in (
+            ("Pause", lambda: self.on_selected(download_manager.pause), "warning-outline"),
+            ("Resume", lambda: self.on_selected(download_manager.resume), "success-outline"),
+            ("Cancel", lambda: self.on_selected(download_manager.cancel), "danger-outline"),
+            ("Priority +", lambda: self.change_priority(1), "info-outline"),
+            ("Priority -", lambda: self.change_priority(-1), "info-outline"),
+            ("Pause All", lambda: loop.call_soon_threadsafe(download_manager.pause_all), "warning"),
+            ("Resume All", lambda: loop.call_soon_threadsafe(download_manager.resume_all), "success"),
+            ("Clear Finished", lambda: loop.call_soon_threadsafe(download_manager.clear_finished), "secondary"),
+            ("Sync", sync_downloads, "primary"),
+        ):
+            ttkb.Button(buttons, text=text, command=command, bootstyle=style).pack(side='left', padx=2, pady=5)
+
+        self.label_throughput = ttkb.Label(self.window, text="")
+        self.label_throughput.pack(pady=(0,10), anchor='w', padx=10)
+
+    def selected_ids(self):
+        return [int(iid) for iid in self.tree.selection()]
+
+    def on_selected(self, action):
+        for job_id in self.selected_ids():
+            loop.call_soon_threadsafe(action, job_id)
+
+    def change_priority(self, step):
+        for job_id in self.selected_ids():
+            priority = self.rows[job_id][4] + step
+            loop.call_soon_threadsafe(download_manager.set_priority, job_id, priority)
+
+    def update_jobs(self, jobs, throughput):
+        seen = set()
+        for job in jobs:
+            job_id = job['job_id']
+            seen.add(job_id)
+            speed = f"{format_size(job['rate'])}/s" if job['state'] == RUNNING else ""
+            state = job['state'] if job['state'] != FAILED else f"failed: {job['error']}"
+            if job['skipped']:
+                state = "up to date"
+            values = (job['name'], state, format_progress(job), speed, job['priority'])
+            if job_id not in self.rows:
+                self.tree.insert('', 'end', iid=str(job_id), values=values)
+            elif self.rows[job_id] != values:
+                self.tree.item(str(job_id), values=values)
+            self.rows[job_id] = values
+        for job_id in set(self.rows) - seen:
+            self.tree.delete(str(job_id))
+            del self.rows[job_id]
+        paused = sum(1 for job in jobs if job['state'] == PAUSED)
+        self.label_throughput.config(text=f"Total: {format_size(throughput)}/s, {len(jobs)} jobs, {paused} paused")
+
+    def close(self):
+        global downloads_window
+        downloads_window = None
+        self.window.destroy()
+
+async def fetch_detail_page(item_ids):
+    session = get_session()
+
+    async def fetch_item(item_id):
+        # Each thumbnail starts downloading as soon as its details arrive
+        item_details = await fetch_workshop_item_details(session, item_id)
+        image = None
+        if item_details and item_details.get('image'):
+            image = await fetch_thumbnail(session, item_details['image'])
+        return item_id, item_details, image
+
+    with metrics.operation('detail_page'):
+        return await asyncio.gather(*(fetch_item(item_id) for item_id in item_ids))
+
+def show_detailed_view():
+    global detail_view
+    # Selected rows when there are any, otherwise everything shown
+    selected_items = results_list.selected_ids() or results.view
     if not selected_items:
         show_toast("Warning", "Please select an item.", icon="warning")
         return
+    if detail_view is None:
+        detail_view = DetailView(root)
+    detail_view.open(list(selected_items), num_models_to_show)
+
+class DetailCell:
+    # One grid position of the detailed view, refilled for every page
+    def __init__(self, master):
+        self.frame = ttkb.Frame(master, bootstyle="light")
+        self.img_label = ttkb.Label(self.frame, text="")
+        self.img_label.pack(pady=10)
+        self.name_label = ttkb.Label(self.frame, text="", wraplength=250, font=('Helvetica', 12, 'bold'))
+        self.name_label.pack(pady=5)
+        self.size_label = ttkb.Label(self.frame, text="", font=('Helvetica', 10))
+        self.size_label.pack(pady=2)
+        self.update_label = ttkb.Label(self.frame, text="", font=('Helvetica', 10))
+        self.update_label.pack(pady=2)
+        self.download_button = ttkb.Button(self.frame, text="Download", bootstyle="success-outline")
+        self.download_button.pack(pady=10)
+
+    def show_loading(self):
+        self.img_label.config(image='', text="Loading...")
+        self.name_label.config(text="")
+        self.size_label.config(text="")
+        self.update_label.config(text="")
+        self.download_button.config(state=tk.DISABLED, command='')
+
+    def show_item(self, item_id, item_details, image):
+        if not item_details:
+            self.img_label.config(image='', text="")
+            self.name_label.config(text="Failed to fetch item details.")
+            self.size_label.config(text=get_item_url(item_id))
+            self.update_label.config(text="")
+            self.download_button.config(state=tk.DISABLED, command='')
+            return
+        if image is not None:
+            self.img_label.config(image=image, text="")
+        else:
+            self.img_label.config(image='', text="No Image Available" if item_details.get('image') else "")
+        self.name_label.config(text=item_details.get('name', 'Unknown Name'))
+        self.size_label.config(text=f"Size: {item_details.get('size', 'Unknown Size')}")
+        self.update_label.config(text=f"Updated: {item_details.get('update', 'Unknown Update')}")
+        name = item_details.get('name', 'unknown_item')
+        self.download_button.config(
+            state=tk.NORMAL,
+            command=lambda: download_button_clicked(item_details.get('url'), name, item_id)
+        )
+
+class DetailView:
+    # A single detailed view window. Its cells are built once and refilled
+    # when the page changes, fetched pages are kept with their PhotoImages so
+    # flipping back is instant, and the pages around the shown one are
+    # fetched in the background while it is being looked at.
+    def __init__(self, master):
+        self.window = ttkb.Toplevel(master)
+        self.window.title("Detailed View")
+        self.window.geometry("800x600")
+        self.window.protocol("WM_DELETE_WINDOW", self.window.withdraw)  # Hidden, the page cache stays
+        self.window.bind('<Left>', lambda event: self.show(self.page - 1))
+        self.window.bind('<Right>', lambda event: self.show(self.page + 1))
+
+        nav_frame = ttkb.Frame(self.window)
+        nav_frame.pack(side='bottom', pady=10)
+        self.prev_button = ttkb.Button(nav_frame, text="Previous Page", bootstyle="info-outline", command=lambda: self.show(self.page - 1))
+        self.prev_button.pack(side="left", padx=10)
+        self.page_label = ttkb.Label(nav_frame, text="")
+        self.page_label.pack(side="left", padx=10)
+        self.next_button = ttkb.Button(nav_frame, text="Next Page", bootstyle="info-outline", command=lambda: self.show(self.page + 1))
+        self.next_button.pack(side="left", padx=10)
+
+        # Create a styled canvas with scrollbar
+        self.scrolled_frame = ScrolledFrame(self.window)
+        self.scrolled_frame.pack(fill=BOTH, expand=YES, padx=10, pady=10)
+
+        self.cells = []
+        self.item_ids = []
+        self.page_size = 0
+        self.page = 0
+        self.pages = OrderedDict()  # Page -> [(item_id, details, PhotoImage)], least recently shown first
+        self.loading = {}  # Page -> future of its fetch on the loop thread
+        self.generation = 0  # Bumped when the items change, fetches started before are dropped
+
+    def open(self, item_ids, page_size):
+        if item_ids != self.item_ids or page_size != self.page_size:
+            for future in self.loading.values():
+                future.cancel()
+            self.loading.clear()
+            self.pages.clear()
+            self.generation += 1
+            self.item_ids = item_ids
+            self.page_size = page_size
+            self.page = 0
+        self.window.deiconify()
+        self.window.lift()
+        self.show(self.page)
+
+    def page_count(self):
+        return (len(self.item_ids) + self.page_size - 1) // self.page_size
+
+    def show(self, page):
+        if not 0 <= page < self.page_count():
+            return
+        self.page = page
+        self.prev_button.config(state=tk.NORMAL if page > 0 else tk.DISABLED)
+        self.next_button.config(state=tk.NORMAL if page + 1 < self.page_count() else tk.DISABLED)
+        self.page_label.config(text=f"Page {page + 1} of {self.page_count()}")
+
+        if page in self.pages:
+            self.pages.move_to_end(page)
+            self.fill(self.pages[page])
+        else:
+            start = page * self.page_size
+            self.fill_loading(len(self.item_ids[start:start + self.page_size]))
+            self.load(page)
+
+        # Fetches for pages the user has moved away from are not needed any more
+        for other, future in list(self.loading.items()):
+            if abs(other - page) > DETAIL_PREFETCH_PAGES:
+                future.cancel()
+                del self.loading[other]
+        for offset in range(1, DETAIL_PREFETCH_PAGES + 1):
+            self.load(page + offset)
+            self.load(page - offset)
+
+    def load(self, page):
+        if page in self.pages or page in self.loading or not 0 <= page < self.page_count():
+            return
+        start = page * self.page_size
+        item_ids = [str(item_id) for item_id in self.item_ids[start:start + self.page_size]]
+        future = asyncio.run_coroutine_threadsafe(fetch_detail_page(item_ids), loop)
+        self.loading[page] = future
+        generation = self.generation
+        future.add_done_callback(lambda done: ui.call(self.loaded, page, generation, done))
+
+    def loaded(self, page, generation, future):
+        if generation != self.generation or self.loading.get(page) is not future:
+            return
+        del self.loading[page]
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            if page == self.page:
+                show_toast("Error", "Failed to fetch item details.", icon="error")
+            return
+
+        # PhotoImages can only be made on the Tk thread, once per cached page
+        entries = []
+        for item_id, item_details, image in future.result():
+            results.set_details(item_id, item_details)  # Names and sizes show up in the results list
+            entries.append((item_id, item_details, ImageTk.PhotoImage(image) if image is not None else None))
+        results_list.schedule_refresh()
+
+        self.pages[page] = entries
+        while len(self.pages) > DETAIL_PAGE_CACHE:
+            oldest = next(iter(self.pages))
+            if oldest == self.page:
+                self.pages.move_to_end(oldest)
+                continue
+            del self.pages[oldest]
+        if page == self.page:
+            self.fill(entries)
+
+    def get_cells(self, count):
+        while len(self.cells) < count:
+            index = len(self.cells)
+            cell = DetailCell(self.scrolled_frame)
+            cell.frame.grid(row=index // DETAIL_COLUMNS, column=index % DETAIL_COLUMNS, padx=10, pady=10, sticky="nsew")
+            self.cells.append(cell)
+        for index, cell in enumerate(self.cells):
+            if index < count:
+                cell.frame.grid()
+            else:
+                cell.frame.grid_remove()
+        return self.cells[:count]
 
-    start_idx = page * num_models_to_show
-    end_idx = min(start_idx + num_models_to_show, len(selected_items))
-
-    detailed_view_window = ttkb.Toplevel(root)
-    detailed_view_window.title("Detailed View")
-    detailed_view_window.geometry("800x600")
+    def fill_loading(self, count):
+        for cell in self.get_cells(count):
+            cell.show_loading()
 
-    # Create a styled canvas with scrollbar
-    scrolled_frame = ScrolledFrame(detailed_view_window)
-    scrolled_frame.pack(fill=BOTH, expand=YES, padx=10, pady=10)
-
-    async def fetch_details():
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for idx in range(start_idx, end_idx):
-                selected_link = selected_items[idx]
-                try:
-                    item_id = fetch_workshop_item_id(selected_link)
-                    tasks.append(fetch_workshop_item_details(session, item_id))
-                except ValueError as ve:
-                    show_toast("Error", f"Invalid URL format: {selected_link}\n{ve}", icon="error")
-                    return
-
-            item_details_list = await asyncio.gather(*tasks)
-
-            row = 0
-            col = 0
-            for item_details in item_details_list:
-                if not item_details:
-                    show_toast("Error", "Failed to fetch item details.", icon="error")
-                    return
-
-                frame = ttkb.Frame(scrolled_frame, bootstyle="light")
-                frame.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-
-                # Load and display image
-                img_url = item_details.get('image')
-                if img_url:
-                    try:
-                        async with session.get(img_url) as img_response:
-                            if img_response.status == 200:
-                                img_data = io.BytesIO(await img_response.read())
-                                img = Image.open(img_data)
-                                img = img.resize((150, 150), Image.LANCZOS)
-                                img = ImageTk.PhotoImage(img)
-
-                                img_label = ttkb.Label(frame, image=img)
-                                img_label.image = img
-                                img_label.pack(pady=10)
-                            else:
-                                no_img_label = ttkb.Label(frame, text="No Image Available")
-                                no_img_label.pack(pady=10)
-                    except Exception:
-                        no_img_label = ttkb.Label(frame, text="No Image Available")
-                        no_img_label.pack(pady=10)
-
-                # Display item details
-                name_label = ttkb.Label(frame, text=item_details.get('name', 'Unknown Name'), wraplength=250, font=('Helvetica', 12, 'bold'))
-                name_label.pack(pady=5)
-
-                size_label = ttkb.Label(frame, text=f"Size: {item_details.get('size', 'Unknown Size')}", font=('Helvetica', 10))
-                size_label.pack(pady=2)
-
-                update_label = ttkb.Label(frame, text=f"Updated: {item_details.get('update', 'Unknown Update')}", font=('Helvetica', 10))
-                update_label.pack(pady=2)
-
-                # Download button with styling
-                download_button = ttkb.Button(
-                    frame, 
-                    text="Download", 
-                    command=lambda url=item_details['url'], name=item_details.get('name', 'unknown_item'): download_button_clicked(url, name),
-                    bootstyle="success-outline"
-                )
-                download_button.pack(pady=10)
-
-                col += 1
-                if col > 2:
-                    col = 0
-                    row += 1
-
-            # Navigation buttons
-            nav_frame = ttkb.Frame(scrolled_frame)
-            nav_frame.grid(row=row+1, columnspan=3, pady=20)
-
-            if start_idx > 0:
-                prev_button = ttkb.Button(nav_frame, text="Previous Page", bootstyle="info-outline", command=lambda: previous_page(detailed_view_window))
-                prev_button.pack(side="left", padx=10)
-
-            if end_idx < len(selected_items):
-                next_button = ttkb.Button(nav_frame, text="Next Page", bootstyle="info-outline", command=lambda: next_page(detailed_view_window))
-                next_button.pack(side="right", padx=10)
-
-    asyncio.run_coroutine_threadsafe(fetch_details(), loop)
-
-def next_page(current_window):
-    current_window.destroy()
-    show_detailed_view(current_page + 1)
-
-def previous_page(current_window):
-    current_window.destroy()
-    show_detailed_view(current_page - 1)
+    def fill(self, entries):
+        for cell, entry in zip(self.get_cells(len(entries)), entries):
+            cell.show_item(*entry)
 
 def start_search():
     search_text = entry_name.get()
@@ -269,72 +662,165 @@ def start_search():
         show_toast("Warning", "Please enter a name!", icon="warning")
         return
 
+    global links_version
+    links_version += 1  # Results of a running check no longer apply
+    version = links_version
+
     async def search_and_fetch():
-        async with aiohttp.ClientSession() as session:
+        with metrics.operation('search'):
+            session = get_session()
             appid = await search_workshop(session, search_text)
             if appid:
-                links = await get_links_from_workshop(session, appid, search_term)
-                listbox_links.delete(0, tk.END)  # Clear previous search results
-                if links:
-                    for link in links:
-                        listbox_links.insert(tk.END, link)
-                    label_results.config(text=f"Found links: {len(links)}")
-                    check_button.pack(pady=10)  # Show the "Check" button
+                ui.call(clear_results, version)  # Clear previous search results
+                found = 0
+                batch = []
+                flushed = time.perf_counter()
+                async for link in iter_links_from_workshop(session, appid, search_term, num_links_to_fetch):
+                    try:
+                        batch.append(fetch_workshop_item_id(link))
+                    except ValueError:
+                        continue
+                    found += 1
+                    if time.perf_counter() - flushed >= RESULTS_FLUSH_INTERVAL:
+                        ui.call(add_results, batch, version)
+                        batch = []
+                        flushed = time.perf_counter()
+                ui.call(add_results, batch, version)
+                if found:
+                    ui.call(check_button.pack, pady=10)  # Show the "Check" button
                 else:
                     show_toast("Info", "No links found.")
-                    label_results.config(text="Found links:")
+                    ui.config(label_results, text="Found links:")
             else:
                 show_toast("Info", "APPID not found")
 
     asyncio.run_coroutine_threadsafe(search_and_fetch(), loop)
 
-def fetch_workshop_item_id(url):
-    pattern = re.compile(r"[0-9]{2,15}")
-    match = pattern.search(url)
-    if match:
-        return match.group(0)
-    else:
-        raise ValueError("CANNOT GET ID!")
+def clear_results(version):
+    if version != links_version:
+        return
+    results.clear()
+    results_list.failed.clear()
+    results_list.selected.clear()
+    results_list.refresh()
+
+def add_results(item_ids, version):
+    if version != links_version:
+        return  # Left over from an earlier search
+    results.add(item_ids)
+    results_list.schedule_refresh()
+    label_results.config(text=f"Found links: {len(results)}")
+
+def schedule_filter():
+    # Filtering waits for a pause in typing instead of running on every key
+    global filter_after_id
+    if filter_after_id is not None:
+        root.after_cancel(filter_after_id)
+    filter_after_id = root.after(FILTER_DELAY_MS, apply_view)
+
+def apply_view(event=None):
+    global filter_after_id
+    filter_after_id = None
+    sort_key = SORT_LABELS[combo_sort.get()]
+    results.apply(entry_filter.get(), sort_key, var_descending.get())
+    results_list.top = 0
+    results_list.refresh()
+    missing = results.missing_details()
+    if sort_key != SORT_FOUND and missing:
+        # Sort keys come from the details, fill in whatever the cache already has
+        asyncio.run_coroutine_threadsafe(load_cached_details(missing, links_version), loop)
+
+async def load_cached_details(item_ids, version):
+    cached = await metadata_cache.get_many([f"details:{item_id}" for item_id in item_ids])
+    if cached:
+        ui.call(apply_cached_details, cached, version)
+
+def apply_cached_details(cached, version):
+    if version != links_version:
+        return
+    for key, details in cached.items():
+        results.set_details(key.split(':', 1)[1], details)
+    results.apply()
+    results_list.refresh()
 
 def check_links():
-    global problematic_links
+    global check_running
+    if check_running:
+        show_toast("Info", "A check is already running.")
+        return
+    item_ids = list(results.ids)
+    version = links_version
+    if not item_ids:
+        return
     problematic_links.clear()
-    global num_threads
-    
-    async def check_and_update():
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for link in listbox_links.get(0, tk.END):
-                try:
-                    item_id = fetch_workshop_item_id(link)
-                    tasks.append(check_link(session, item_id))
-                except ValueError:
-                    problematic_links.append(link)
+    results_list.failed.clear()
+    checked = 0
+    unchecked = 0  # Items whose details could not be fetched at all
+    last_error = None
 
-            results = await asyncio.gather(*tasks)
+    check_running = True
+    check_button.config(state=tk.DISABLED)
 
-            for link, result in zip(listbox_links.get(0, tk.END), results):
-                if not result:
-                    problematic_links.append(link)
+    async def check_and_update():
+        session = get_session()
 
-        # Remove problematic links from the listbox
-        for link in problematic_links:
+        async def check(item_id):
+            # A request that fails for good leaves its item unchecked, not broken
             try:
-                index = listbox_links.get(0, tk.END).index(link)
-                listbox_links.delete(index)
-            except ValueError:
-                continue
-        
-        label_results.config(text=f"Found links: {listbox_links.size()}")
-        show_toast("Check Complete", "Problematic links have been removed.")
+                return item_id, await fetch_workshop_item_details(session, str(item_id)), None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                return item_id, None, str(e) or type(e).__name__
 
-    asyncio.run_coroutine_threadsafe(check_and_update(), loop)
+        batch = []
+        flushed = time.perf_counter()
+        try:
+            with metrics.operation('check'):
+                for finished in asyncio.as_completed([check(item_id) for item_id in item_ids]):
+                    batch.append(await finished)
+                    if time.perf_counter() - flushed >= RESULTS_FLUSH_INTERVAL:
+                        ui.call(mark_checked, batch)
+                        batch = []
+                        flushed = time.perf_counter()
+            ui.call(mark_checked, batch)
+        finally:
+            ui.call(finish_check)
+
+    def mark_checked(batch):
+        nonlocal checked, unchecked, last_error
+        if version != links_version:
+            return  # A new search replaced the links being checked
+        checked += len(batch)
+        for item_id, details, error in batch:
+            if error is not None:
+                unchecked += 1
+                last_error = error
+            elif details:
+                results.set_details(item_id, details)
+            else:
+                results_list.failed.add(item_id)
+                problematic_links.append(get_item_url(item_id))
+        results_list.schedule_refresh()
+        label_results.config(text=f"Checking links: {checked} / {len(item_ids)}, {len(problematic_links)} problematic, {unchecked} failed to check")
+
+    def finish_check():
+        global check_running
+        check_running = False
+        check_button.config(state=tk.NORMAL)
+        if version != links_version:
+            return
+        removed = results.remove(results_list.failed)
+        results_list.failed.clear()
+        results_list.refresh()
+        label_results.config(text=f"Found links: {len(results)}")
+        if unchecked or checked < len(item_ids):
+            # Interrupted, or requests failed for good: the rest are kept as they are
+            not_checked = unchecked + len(item_ids) - checked
+            reason = f" ({last_error})" if last_error else ""
+            show_toast("Check Incomplete", f"{not_checked} links could not be checked{reason}. {removed} problematic links have been removed.", icon="warning")
+        else:
+            show_toast("Check Complete", f"{removed} problematic links have been removed.")
 
-async def check_link(session, item_id):
-    item_details = await fetch_workshop_item_details(session, item_id)
-    if not item_details:
-        return False
-    return True
+    asyncio.run_coroutine_threadsafe(check_and_update(), loop)
 
 def show_problematic_links():
     if not problematic_links:
@@ -356,7 +842,7 @@ def show_problematic_links():
 def show_settings():
     settings_window = ttkb.Toplevel(root)
     settings_window.title("Settings")
-    settings_window.geometry("400x400")
+    settings_window.geometry("400x740")
 
     # Threads setting
     label_threads = ttkb.Label(settings_window, text="Number of Threads:")
@@ -379,6 +865,23 @@ def show_settings():
     entry_models_to_show.pack(pady=5)
     entry_models_to_show.insert(0, str(num_models_to_show))
 
+    # Parallel downloads setting
+    label_max_downloads = ttkb.Label(settings_window, text="Parallel Downloads:")
+    label_max_downloads.pack(pady=(20,5))
+    entry_max_downloads = ttkb.Entry(settings_window)
+    entry_max_downloads.pack(pady=5)
+    entry_max_downloads.insert(0, str(max_downloads))
+
+    # Connections per download setting
+    label_download_segments = ttkb.Label(settings_window, text="Connections per Download:")
+    label_download_segments.pack(pady=(20,5))
+    entry_download_segments = ttkb.Entry(settings_window)
+    entry_download_segments.pack(pady=5)
+    entry_download_segments.insert(0, str(download_segments))
+    var_extract = tk.BooleanVar(value=extract_downloads)
+    extract_check = ttkb.Checkbutton(settings_window, text="Extract .zip downloads into a folder per item", variable=var_extract)
+    extract_check.pack(pady=(10,5))
+
     # Download directory setting
     label_download_directory = ttkb.Label(settings_window, text="Download Directory:")
     label_download_directory.pack(pady=(20,5))
@@ -396,11 +899,14 @@ def show_settings():
     browse_button.pack(pady=10)
 
     def save_settings():
-        global num_threads, num_links_to_fetch, num_models_to_show, download_directory
+        global num_threads, num_links_to_fetch, num_models_to_show, download_directory, max_downloads, download_segments
+        global extract_downloads
         try:
             num_threads_new = int(entry_threads.get())
             num_links_to_fetch_new = int(entry_links_to_fetch.get())
             num_models_to_show_new = int(entry_models_to_show.get())
+            max_downloads_new = max(1, int(entry_max_downloads.get()))
+            download_segments_new = max(1, int(entry_download_segments.get()))
             download_directory_new = entry_download_directory.get().strip()
 
             if download_directory_new:
@@ -408,9 +914,16 @@ def show_settings():
                     os.makedirs(download_directory_new, exist_ok=True)
 
             num_threads = num_threads_new
+            loop.call_soon_threadsafe(scheduler.configure, num_threads)
             num_links_to_fetch = num_links_to_fetch_new
             num_models_to_show = num_models_to_show_new
             download_directory = download_directory_new
+            max_downloads = max_downloads_new
+            loop.call_soon_threadsafe(download_manager.set_workers, max_downloads)
+            download_segments = download_segments_new
+            download_manager.segments = download_segments  # Read when the next download starts
+            extract_downloads = var_extract.get()
+            download_manager.extract = extract_downloads
 
             save_settings_to_file()
             show_toast("Success", "Settings saved successfully.")
@@ -423,65 +936,35 @@ def show_settings():
     save_button = ttkb.Button(settings_window, text="Save", command=save_settings, bootstyle="success")
     save_button.pack(pady=20)
 
-# Initialize main application window
-root = ttkb.Window(themename="darkly")
-root.title("Steam Workshop")
-root.geometry("1000x600")
-
-# Load settings on startup
-load_settings()
-
-# Create the sidebar menu frame
-sidebar = ttkb.Frame(root, bootstyle="dark")
-sidebar.pack(expand=False, fill='y', side='left', anchor='nw')
-
-# Sidebar menu label
-sidebar_label = ttkb.Label(sidebar, text="Steam Workshop", font=('Helvetica', 16, 'bold'), bootstyle="inverse-dark")
-sidebar_label.pack(pady=30)
-
-# Start button in the sidebar
-start_button = ttkb.Button(sidebar, text="Start", command=start_search, bootstyle="success")
-start_button.pack(pady=10, fill='x', padx=10)
-
-# Detailed view button in the sidebar
-details_button = ttkb.Button(sidebar, text="Detailed View", command=show_detailed_view, bootstyle="info")
-details_button.pack(pady=10, fill='x', padx=10)
-
-# Problematic links button in the sidebar
-problematic_button = ttkb.Button(sidebar, text="Problematic Links", command=show_problematic_links, bootstyle="warning")
-problematic_button.pack(pady=10, fill='x', padx=10)
-
-# Settings button in the sidebar
-settings_button = ttkb.Button(sidebar, text="Settings", command=show_settings, bootstyle="secondary")
-settings_button.pack(pady=10, fill='x', padx=10)
-
-# Create the main content frame
-main_content = ttkb.Frame(root)
-main_content.pack(expand=True, fill='both', side='right', padx=20, pady=20)
-
-# Entry for "Enter Name"
-label_name = ttkb.Label(main_content, text="Enter Name:")
-label_name.pack(pady=(10,5), anchor='w')
-entry_name = ttkb.Entry(main_content, width=50)
-entry_name.pack(pady=5, fill='x')
-
-# Entry for "Enter Keyword (optional):"
-label_keyword = ttkb.Label(main_content, text="Enter Keyword (optional):")
-label_keyword.pack(pady=(20,5), anchor='w')
-entry_keyword = ttkb.Entry(main_content, width=50)
-entry_keyword.pack(pady=5, fill='x')
-
-# Listbox to display the results
-label_results = ttkb.Label(main_content, text="Found Links:")
-label_results.pack(pady=(20,5), anchor='w')
-listbox_links = tk.Listbox(main_content, width=100, height=15, font=('Helvetica', 10), bg='#2c3e50', fg='white')
-listbox_links.pack(pady=5, fill='both', expand=True)
+    cache_stats = metadata_cache.stats()
+    label_cache = ttkb.Label(
+        settings_window,
+        text=f"Metadata cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['coalesced']} shared requests"
+    )
+    label_cache.pack(pady=(0,10))
 
-# Add "Check" button with styling
-check_button = ttkb.Button(main_content, text="Check", command=check_links, bootstyle="primary")
-check_button.pack(pady=10)
+    def export_metrics():
+        try:
+            metrics.write_json(METRICS_FILE)
+            metrics.write_prometheus(PROMETHEUS_FILE)
+        except OSError as e:
+            show_toast("Error", f"Failed to export metrics: {e}", icon="error")
+            return
+        show_toast("Success", f"Metrics written to {METRICS_FILE} and {PROMETHEUS_FILE}.")
+
+    def toggle_profiling():
+        metrics.enable_profiling(PROFILE_DIR if var_profiling.get() else None)
+
+    metrics_button = ttkb.Button(settings_window, text="Export Metrics", command=export_metrics, bootstyle="info-outline")
+    metrics_button.pack(pady=5)
+    var_profiling = tk.BooleanVar(value=bool(metrics.profile_dir))
+    profiling_check = ttkb.Checkbutton(settings_window, text=f"Profile searches, checks and downloads into {PROFILE_DIR}/", variable=var_profiling, command=toggle_profiling)
+    profiling_check.pack(pady=5)
 
 def show_toast(title, message, duration=3000, icon="info"):
+    if threading.current_thread() is not threading.main_thread():
+        ui.call(show_toast, title, message, duration, icon)
+        return
     toast = ToastNotification(
         title=title,
         message=message,
@@ -490,5 +973,104 @@ def show_toast(title, message, duration=3000, icon="info"):
     )
     toast.show_toast()
 
-# Run the application
-root.mainloop()
+# Worker processes re-import this module, only the main process builds the UI
+if __name__ == "__main__":
+    loop_thread.start()
+
+    # Initialize main application window
+    root = ttkb.Window(themename="darkly")
+    root.title("Steam Workshop")
+    root.geometry("1000x600")
+
+    ui.start(root)
+
+    # Load settings on startup
+    load_settings()
+    scheduler.configure(num_threads)
+    download_manager.workers = max_downloads
+    download_manager.segments = download_segments
+    download_manager.extract = extract_downloads
+    asyncio.run_coroutine_threadsafe(download_manager.start(), loop)
+
+    # Create the sidebar menu frame
+    sidebar = ttkb.Frame(root, bootstyle="dark")
+    sidebar.pack(expand=False, fill='y', side='left', anchor='nw')
+
+    # Sidebar menu label
+    sidebar_label = ttkb.Label(sidebar, text="Steam Workshop", font=('Helvetica', 16, 'bold'), bootstyle="inverse-dark")
+    sidebar_label.pack(pady=30)
+
+    # Start button in the sidebar
+    start_button = ttkb.Button(sidebar, text="Start", command=start_search, bootstyle="success")
+    start_button.pack(pady=10, fill='x', padx=10)
+
+    # Detailed view button in the sidebar
+    details_button = ttkb.Button(sidebar, text="Detailed View", command=show_detailed_view, bootstyle="info")
+    details_button.pack(pady=10, fill='x', padx=10)
+
+    # Problematic links button in the sidebar
+    problematic_button = ttkb.Button(sidebar, text="Problematic Links", command=show_problematic_links, bootstyle="warning")
+    problematic_button.pack(pady=10, fill='x', padx=10)
+
+    # Download queue button in the sidebar
+    downloads_button = ttkb.Button(sidebar, text="Downloads", command=show_downloads, bootstyle="primary")
+    downloads_button.pack(pady=10, fill='x', padx=10)
+
+    # Settings button in the sidebar
+    settings_button = ttkb.Button(sidebar, text="Settings", command=show_settings, bootstyle="secondary")
+    settings_button.pack(pady=10, fill='x', padx=10)
+
+    # Create the main content frame
+    main_content = ttkb.Frame(root)
+    main_content.pack(expand=True, fill='both', side='right', padx=20, pady=20)
+
+    # Entry for "Enter Name"
+    label_name = ttkb.Label(main_content, text="Enter Name:")
+    label_name.pack(pady=(10,5), anchor='w')
+    entry_name = ttkb.Entry(main_content, width=50)
+    entry_name.pack(pady=5, fill='x')
+
+    # Entry for "Enter Keyword (optional):"
+    label_keyword = ttkb.Label(main_content, text="Enter Keyword (optional):")
+    label_keyword.pack(pady=(20,5), anchor='w')
+    entry_keyword = ttkb.Entry(main_content, width=50)
+    entry_keyword.pack(pady=5, fill='x')
+
+    # Listbox to display the results
+    label_results = ttkb.Label(main_content, text="Found Links:")
+    label_results.pack(pady=(20,5), anchor='w')
+    # Filter and sort the results without fetching them again
+    results_toolbar = ttkb.Frame(main_content)
+    results_toolbar.pack(pady=5, fill='x')
+    ttkb.Label(results_toolbar, text="Filter:").pack(side='left')
+    entry_filter = ttkb.Entry(results_toolbar, width=30)
+    entry_filter.pack(side='left', padx=5)
+    entry_filter.bind('<KeyRelease>', lambda event: schedule_filter())
+    ttkb.Label(results_toolbar, text="Sort by:").pack(side='left', padx=(15,0))
+    combo_sort = ttkb.Combobox(results_toolbar, values=list(SORT_LABELS), state='readonly', width=14)
+    combo_sort.current(0)
+    combo_sort.pack(side='left', padx=5)
+    combo_sort.bind('<<ComboboxSelected>>', apply_view)
+    var_descending = tk.BooleanVar(value=False)
+    ttkb.Checkbutton(results_toolbar, text="Descending", variable=var_descending, command=apply_view).pack(side='left', padx=5)
+
+    results_list = VirtualListbox(main_content, results, width=100, height=15, font=('Helvetica', 10), bg='#2c3e50', fg='white')
+    results_list.pack(pady=5, fill='both', expand=True)
+
+    # Add "Check" button with styling
+    check_button = ttkb.Button(main_content, text="Check", command=check_links, bootstyle="primary")
+    check_button.pack(pady=10)
+
+    # Progress of the download queue
+    label_download_status = ttkb.Label(main_content, text="")
+    label_download_status.pack(pady=(0,5), anchor='w')
+    refresh_downloads()
+
+    def on_close():
+        shutdown_event_loop()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
+    # Run the application
+    root.mainloop()
@@ -0,0 +1,186 @@
+# Batch search, validation and download without the GUI.
+#
+#   python workshop_cli.py --name "Garry's Mod" --keyword tank --limit 60 --check
+#   python workshop_cli.py --ids items.txt --download --dir mods
+#   python workshop_cli.py --sync --dir mods
+#
+# The ids file holds one workshop item id or link per line, blank lines and
+# lines starting with # are ignored. Defaults come from settings.txt. Items
+# already downloaded and not updated since are skipped, --sync checks every
+# item downloaded into the directory and fetches the updated ones.
+
+import argparse
+import sys
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Search, check and download Steam Workshop items in batch.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--name', help="game name to search the workshop of")
+    source.add_argument('--ids', metavar='FILE', help="file with one item id or link per line")
+    source.add_argument('--sync', action='store_true', help="download the updated items out of those already in the download directory")
+    parser.add_argument('--keyword', help="only items matching this keyword (with --name)")
+    parser.add_argument('--limit', type=int, help="number of links to fetch (with --name)")
+    parser.add_argument('--check', action='store_true', help="fetch the details of every item and report the broken ones")
+    parser.add_argument('--download', action='store_true', help="download every item that passes the check")
+    parser.add_argument('--dir', help="download directory")
+    parser.add_argument('--threads', type=int, help="concurrent requests per host")
+    parser.add_argument('--jobs', type=int, help="downloads running at the same time")
+    parser.add_argument('--segments', type=int, help="connections per download for large files")
+    parser.add_argument('--extract', action='store_true', help="unpack every downloaded .zip into a folder named after it")
+    parser.add_argument('--metrics', metavar='FILE', help="write request and timing metrics as JSON when done")
+    parser.add_argument('--prometheus', metavar='FILE', help="write the same metrics in the Prometheus text format")
+    parser.add_argument('--profile', metavar='DIR', help="write a cProfile dump of every search, check and download")
+    return parser.parse_args(argv)
+
+def read_item_ids(path, fetch_workshop_item_id):
+    item_ids = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                item_ids.append(fetch_workshop_item_id(line))
+            except ValueError:
+                print(f"SKIP {line}: no item id", file=sys.stderr)
+    return item_ids
+
+def report_job(job, core):
+    from workshop_downloads import DONE
+
+    if job.state != DONE:
+        print(f"FAIL {job.item_id} {job.error}")
+        return
+    if job.skipped:
+        print(f"SKIP {job.item_id} unchanged, {job.path}")
+    else:
+        print(f"SAVE {job.item_id} {job.path} ({core.format_size(job.total)}, {core.format_size(job.rate)}/s)")
+    if job.extract_seconds is not None:
+        print(f"EXTR {job.item_id} {job.extracted} ({job.extract_seconds:.2f} s)")
+
+async def run(args, settings):
+    import asyncio
+    import aiohttp
+    import workshop_core as core
+    from workshop_downloads import DONE, DownloadManager
+    from workshop_metrics import metrics
+
+    core.scheduler.configure(settings['num_threads'])
+    if args.profile:
+        metrics.enable_profiling(args.profile)
+    session = core.get_session()
+    failures = 0
+    try:
+        if args.sync:
+            return await sync(args, settings, core)
+        if args.name:
+            with metrics.operation('search'):
+                appid = await core.search_workshop(session, args.name)
+                if not appid:
+                    print(f"APPID not found for {args.name}", file=sys.stderr)
+                    return 1
+                item_ids = []
+                async for link in core.iter_links_from_workshop(session, appid, args.keyword, settings['num_links_to_fetch']):
+                    try:
+                        item_ids.append(core.fetch_workshop_item_id(link))
+                    except ValueError:
+                        print(f"SKIP {link}: no item id", file=sys.stderr)
+                        continue
+                    if not args.check and not args.download:
+                        print(link)
+        else:
+            item_ids = read_item_ids(args.ids, core.fetch_workshop_item_id)
+
+        if not args.check and not args.download:
+            return 0
+
+        # Details come back as they finish, the scheduler bounds the requests
+        # A request that fails for good is reported for its item, the rest go on
+        async def fetch(item_id):
+            try:
+                return item_id, await core.fetch_workshop_item_details(session, item_id), None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                return item_id, None, str(e) or type(e).__name__
+
+        valid = []
+        with metrics.operation('check'):
+            for finished in asyncio.as_completed([fetch(item_id) for item_id in item_ids]):
+                item_id, details, error = await finished
+                if error is not None:
+                    failures += 1
+                    print(f"ERR  {item_id} {error}")
+                elif details:
+                    valid.append((item_id, details))
+                    print(f"OK   {item_id} {details.get('name', '')}")
+                else:
+                    failures += 1
+                    print(f"BAD  {item_id}")
+
+        if args.download:
+            # Same queue as the GUI, with its retries, kept in memory only
+            manager = DownloadManager(
+                None, settings['max_downloads'], on_finished=lambda job: report_job(job, core), segments=settings['download_segments'],
+                extract=settings['extract_downloads']
+            )
+            await manager.start()
+            jobs = [
+                manager.add(details.get('url'), details.get('name', 'unknown_item'), 0, item_id, settings['download_directory'])
+                for item_id, details in valid
+            ]
+            try:
+                await manager.join()
+            finally:
+                await manager.stop()
+            failures += sum(1 for job in jobs if job.state != DONE)
+    finally:
+        await core.close_session()
+        core.shutdown_executors()
+        if args.metrics:
+            metrics.write_json(args.metrics)
+        if args.prometheus:
+            metrics.write_prometheus(args.prometheus)
+
+    print(f"{len(item_ids)} items, {failures} failed", file=sys.stderr)
+    return 1 if failures else 0
+
+async def sync(args, settings, core):
+    from workshop_downloads import DONE, DownloadManager
+
+    manager = DownloadManager(
+        None, settings['max_downloads'], on_finished=lambda job: report_job(job, core), segments=settings['download_segments'],
+        extract=settings['extract_downloads']
+    )
+    await manager.start()
+    try:
+        jobs = await manager.sync(None, settings['download_directory'])
+        await manager.join()
+    finally:
+        await manager.stop()
+    failures = sum(1 for job in jobs if job.state != DONE)
+    print(f"{len(jobs)} updated items, {failures} failed", file=sys.stderr)
+    return 1 if failures else 0
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Imported only now so --help and argument errors never pay for aiohttp
+    import asyncio
+    import workshop_core as core
+
+    settings = core.read_settings() or dict(core.DEFAULT_SETTINGS)
+    if args.limit is not None:
+        settings['num_links_to_fetch'] = args.limit
+    if args.threads is not None:
+        settings['num_threads'] = args.threads
+    if args.dir is not None:
+        settings['download_directory'] = args.dir
+    if args.jobs is not None:
+        settings['max_downloads'] = args.jobs
+    if args.segments is not None:
+        settings['download_segments'] = args.segments
+    if args.extract:
+        settings['extract_downloads'] = True
+    return asyncio.run(run(args, settings))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1126 @@
+# Network core shared by the GUI (work.py) and the batch CLI (workshop_cli.py).
+# Nothing here may import tkinter, ttkbootstrap or PIL.
+
+import asyncio
+import base64
+import hashlib
+import json
+import mmap
+import os
+import random
+import re
+import sqlite3
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from workshop_metrics import get_trace_config, metrics
+from workshop_parse import extract_workshop_links
+
+# Default settings, stored one per line in SETTINGS_FILE
+DEFAULT_SETTINGS = {
+    'num_threads': 1,
+    'num_links_to_fetch': 10,
+    'num_models_to_show': 9,
+    'download_directory': '',
+    'max_downloads': 2,
+    'download_segments': 4,
+    'extract_downloads': False
+}
+
+SETTINGS_FILE = 'settings.txt'
+CACHE_FILE = 'cache.sqlite3'  # Metadata cache, kept next to the settings file
+
+CHUNK_SIZE = 256 * 1024  # Bytes read from the network per chunk
+MAX_RESUME_ATTEMPTS = 5  # Reconnects allowed per download before giving up
+PROGRESS_INTERVAL = 0.5  # Seconds between download progress reports
+SEGMENT_MIN_SIZE = 8 * 1024 * 1024  # Smallest byte range worth its own connection
+SEGMENTS_SAVE_INTERVAL = 1.0  # Seconds between writes of a segmented download's progress file
+DIGEST_NAMES = {'md5': 'md5', 'sha-256': 'sha256', 'sha256': 'sha256'}  # Digest header names -> hashlib names
+
+# Connection pool settings for the shared HTTP session
+CONNECTION_LIMIT = 100  # Open connections across all hosts
+CONNECTION_LIMIT_PER_HOST = 10  # Open connections to a single host
+KEEPALIVE_TIMEOUT = 60  # Seconds an idle connection is kept for reuse
+DNS_CACHE_TTL = 300  # Seconds a resolved host name is cached
+CONNECT_TIMEOUT = 15  # Seconds allowed to open a connection
+READ_TIMEOUT = 60  # Seconds without data before a read fails
+
+# Request scheduling, the per host concurrency comes from num_threads
+RATE_LIMIT = 10.0  # Requests per second allowed to a single host
+RATE_BURST = 10  # Requests that may go out back to back before the rate applies
+MIN_RATE = 0.5  # Lowest rate adaptive backoff may drop a host to
+MAX_RETRIES = 4  # Retries for a request that failed with a transient error
+BACKOFF_BASE = 0.5  # Seconds before the first retry, doubled on every retry
+BACKOFF_MAX = 30  # Longest single wait between retries
+LATENCY_FACTOR = 3.0  # Back off when latency grows past this multiple of the best seen
+LATENCY_FLOOR = 0.25  # Latencies under this many seconds never count as congestion
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+WORKSHOP_ID_PATTERN = re.compile(r"[0-9]{2,15}")
+ITEM_URL = "https://steamcommunity.com/sharedfiles/filedetails/?id="  # Also the item's id for ggntw, never fetched
+
+# Services the app talks to. The environment can point them somewhere else,
+# benchmarks/fake_steam.py serves both for running offline.
+STEAM_URL = os.environ.get('WORKSHOP_STEAM_URL', 'https://steamcommunity.com').rstrip('/')
+STEAM_API_URL = os.environ.get('WORKSHOP_STEAM_API_URL', 'https://api.steampowered.com').rstrip('/')
+GGNTW_URL = os.environ.get('WORKSHOP_GGNTW_URL', 'https://api.ggntw.com').rstrip('/')
+
+LINKS_PER_PAGE = 30  # Items on one workshop browse page
+PARSE_WORKERS = 2  # Processes parsing browse pages off the loop thread
+
+CACHE_MAX_ENTRIES = 20000  # Least recently used entries past this are evicted
+CACHE_EVICT_INTERVAL = 100  # Writes between eviction passes
+CACHE_BATCH_SIZE = 500  # Keys looked up per query by get_many
+DETAILS_TTL = 60 * 60  # Seconds item details are reused
+DOWNLOAD_URL_TTL = 60 * 60  # Seconds a download link from ggntw is reused, they expire
+BATCH_WINDOW = 0.02  # Seconds item ids are collected before their details are requested together
+BATCH_SIZE = 100  # Item ids per GetPublishedFileDetails request
+APPID_TTL = 7 * 24 * 60 * 60  # Seconds a game name keeps resolving to the same appid
+
+# One HTTP session shared by every request, owned by the loop thread
+http_session = None
+
+def get_session():
+    # Must be called from the loop thread
+    global http_session
+    if http_session is None or http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTION_LIMIT,
+            limit_per_host=CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL
+        )
+        # No total timeout, large downloads are only bounded by the read timeout
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        http_session = aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[get_trace_config()])
+    return http_session
+
+async def close_session():
+    global http_session
+    if http_session is not None:
+        await http_session.close()
+        http_session = None
+
+class HostLimiter:
+    # Concurrency window and token bucket for one host. Both shrink by half on
+    # throttling or rising latency and grow back additively (AIMD).
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.rate = RATE_LIMIT
+        self.tokens = float(RATE_BURST)
+        self.refilled = time.monotonic()
+        self.in_flight = 0
+        self.waiters = deque()
+        self.best_latency = None
+        self.avg_latency = None
+        self.last_decrease = 0.0
+
+    def slots(self):
+        return max(1, int(self.limit)) - self.in_flight
+
+    def wake_waiters(self):
+        free = self.slots()
+        while free > 0 and self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def acquire(self):
+        while self.slots() <= 0:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                elif not waiter.cancelled():
+                    self.wake_waiters()  # Hand our wake-up to the next waiter
+                raise
+        self.in_flight += 1
+        try:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(RATE_BURST, self.tokens + (now - self.refilled) * self.rate)
+                self.refilled = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self.wake_waiters()
+
+    def record_success(self, latency):
+        if self.best_latency is None or latency < self.best_latency:
+            self.best_latency = latency
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+        if self.avg_latency > LATENCY_FLOOR and self.avg_latency > self.best_latency * LATENCY_FACTOR:
+            self.record_congestion()
+            return
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self.rate = min(RATE_LIMIT, self.rate + 1 / self.rate)
+        self.wake_waiters()
+
+    def record_congestion(self):
+        # Only halve once per round trip, a burst of errors is one signal
+        now = time.monotonic()
+        if now - self.last_decrease < max(self.avg_latency or 0, 1.0):
+            return
+        self.last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+        self.rate = max(MIN_RATE, self.rate / 2)
+
+class RequestScheduler:
+    # Every outbound request goes through here so each host sees a bounded,
+    # rate limited stream of requests with retries on transient failures
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max(1, max_concurrency)
+        self.hosts = {}
+
+    def configure(self, max_concurrency):
+        # Must be called from the loop thread once requests have been made
+        self.max_concurrency = max(1, max_concurrency)
+        for limiter in self.hosts.values():
+            limiter.max_concurrency = self.max_concurrency
+            limiter.limit = min(limiter.limit, self.max_concurrency)
+            limiter.wake_waiters()
+
+    def get_limiter(self, url):
+        host = urlsplit(url).hostname or ''
+        if host not in self.hosts:
+            self.hosts[host] = HostLimiter(self.max_concurrency)
+        return self.hosts[host]
+
+    @asynccontextmanager
+    async def request(self, session, method, url, streamed=False, **kwargs):
+        # streamed frees the host's slot once the headers are in, for download
+        # bodies that take minutes. The download workers bound those instead,
+        # and other requests to the host are not held up behind them.
+        limiter = self.get_limiter(url)
+        host = urlsplit(url).hostname or ''
+        attempt = 0
+        while True:
+            with metrics.timer('scheduler_wait_seconds', {'host': host}):
+                await limiter.acquire()
+            started = time.monotonic()
+            try:
+                response = await session.request(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                limiter.release()
+                limiter.record_congestion()
+                if attempt >= MAX_RETRIES:
+                    raise
+                metrics.count('http_retries_total', 1, {'host': host, 'reason': 'connection'})
+                await asyncio.sleep(get_backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                limiter.release()
+                raise
+
+            if response.status in RETRY_STATUSES:
+                limiter.record_congestion()
+                if attempt < MAX_RETRIES:
+                    metrics.count('http_retries_total', 1, {'host': host, 'reason': str(response.status)})
+                    delay = get_retry_after(response) or get_backoff(attempt)
+                    response.release()
+                    limiter.release()
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+            else:
+                limiter.record_success(time.monotonic() - started)
+
+            if streamed:
+                limiter.release()
+            try:
+                yield response
+            finally:
+                response.release()
+                if not streamed:
+                    limiter.release()
+            return
+
+def get_backoff(attempt):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def get_retry_after(response):
+    retry_after = response.headers.get('Retry-After', '')
+    if retry_after.isdigit():
+        return min(BACKOFF_MAX, int(retry_after))
+    return None
+
+scheduler = RequestScheduler(DEFAULT_SETTINGS['num_threads'])
+
+parse_executor = None
+
+def get_parse_executor():
+    global parse_executor
+    if parse_executor is None:
+        parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    return parse_executor
+
+class MetadataCache:
+    # SQLite backed cache with a TTL per entry and LRU eviction. All database
+    # work runs on one dedicated thread, and concurrent lookups of the same key
+    # share a single fetch.
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.connection = None
+        self.writes = 0
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, used REAL NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+            self.evict()
+        return self.connection
+
+    def read(self, key):
+        db = self.connect()
+        now = time.time()
+        row = db.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            db.commit()
+            return None
+        db.execute("UPDATE entries SET used = ? WHERE key = ?", (now, key))
+        db.commit()
+        return json.loads(row[0])
+
+    def read_many(self, keys):
+        # Unexpired values of the given keys, without touching their LRU order
+        db = self.connect()
+        now = time.time()
+        values = {}
+        keys = list(keys)
+        for start in range(0, len(keys), CACHE_BATCH_SIZE):
+            batch = keys[start:start + CACHE_BATCH_SIZE]
+            rows = db.execute(
+                f"SELECT key, value FROM entries WHERE expires >= ? AND key IN ({', '.join('?' * len(batch))})",
+                (now, *batch)
+            )
+            for key, value in rows:
+                values[key] = json.loads(value)
+        return values
+
+    def write(self, key, value, ttl):
+        db = self.connect()
+        now = time.time()
+        db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, json.dumps(value), now + ttl, now))
+        db.commit()
+        self.writes += 1
+        if self.writes % CACHE_EVICT_INTERVAL == 0:
+            self.evict()
+
+    def evict(self):
+        db = self.connection
+        db.execute("DELETE FROM entries WHERE expires < ?", (time.time(),))
+        db.execute(
+            "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        db.commit()
+
+    async def get(self, key):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, metrics.timed, 'cache_read_seconds', self.read, key)
+
+    async def get_many(self, keys):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, metrics.timed, 'cache_read_seconds', self.read_many, keys)
+
+    async def put(self, key, value, ttl):
+        await asyncio.get_running_loop().run_in_executor(self.executor, metrics.timed, 'cache_write_seconds', self.write, key, value, ttl)
+
+    async def get_or_fetch(self, key, ttl, fetch):
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.load(key, ttl, fetch))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self.in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller giving up does not cancel the others
+        return await asyncio.shield(task)
+
+    async def load(self, key, ttl, fetch):
+        try:
+            value = await self.get(key)
+        except sqlite3.Error:
+            value = None
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = await fetch()
+        if value is not None:
+            try:
+                await self.put(key, value, ttl)
+            except sqlite3.Error:
+                pass
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        def close_connection():
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+        self.executor.submit(close_connection)
+        self.executor.shutdown(wait=True)
+
+metadata_cache = MetadataCache(CACHE_FILE, CACHE_MAX_ENTRIES)
+metrics.add_gauges('metadata_cache', metadata_cache.stats)
+
+def read_settings(path=SETTINGS_FILE):
+    # Returns None when the file is missing or incomplete
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        lines = file.readlines()
+    if len(lines) < 4:
+        return None
+    settings = dict(DEFAULT_SETTINGS)
+    settings['num_threads'] = int(lines[0].strip())
+    settings['num_links_to_fetch'] = int(lines[1].strip())
+    settings['num_models_to_show'] = int(lines[2].strip())
+    settings['download_directory'] = lines[3].strip()
+    # Lines added after the first four are optional so older files still load
+    if len(lines) > 4 and lines[4].strip():
+        settings['max_downloads'] = int(lines[4].strip())
+    if len(lines) > 5 and lines[5].strip():
+        settings['download_segments'] = int(lines[5].strip())
+    if len(lines) > 6 and lines[6].strip():
+        settings['extract_downloads'] = lines[6].strip() == '1'
+    return settings
+
+def write_settings(settings, path=SETTINGS_FILE):
+    with open(path, 'w') as file:
+        file.write(f"{settings['num_threads']}\n")
+        file.write(f"{settings['num_links_to_fetch']}\n")
+        file.write(f"{settings['num_models_to_show']}\n")
+        file.write(f"{settings['download_directory']}\n")
+        file.write(f"{settings['max_downloads']}\n")
+        file.write(f"{settings['download_segments']}\n")
+        file.write(f"{int(settings['extract_downloads'])}\n")
+
+def shutdown_executors():
+    # Call once the loop has stopped using the core
+    if parse_executor is not None:
+        parse_executor.shutdown(wait=False, cancel_futures=True)
+    metadata_cache.close()
+
+async def search_workshop(session, search_text):
+    key = f"appid:{search_text.strip().lower()}"
+    return await metadata_cache.get_or_fetch(key, APPID_TTL, lambda: request_appid(session, search_text))
+
+async def request_appid(session, search_text):
+    search_url = f"{STEAM_URL}/workshop/ajaxfindworkshops/?searchText={search_text}"
+    async with scheduler.request(session, 'GET', search_url) as response:
+        if response.status == 200:
+            data = await response.json()
+            if data:
+                appid = data[0]['appid']
+                return appid
+    return None
+
+def get_browse_url(appid, page, search_term=None):
+    browse_url = f"{STEAM_URL}/workshop/browse/?appid={appid}&p={page}"
+    if search_term:
+        browse_url += f"&searchtext={search_term}"
+    browse_url += "&childpublishedfileid=0&browsesort=textsearch&section=&actualsort=textsearch"
+    return browse_url
+
+async def fetch_browse_page(session, appid, page, search_term=None):
+    # Returns the links on one browse page, [] past the last page or None on failure
+    async with scheduler.request(session, 'GET', get_browse_url(appid, page, search_term)) as response:
+        if response.status != 200:
+            return None
+        page_source = await response.text()
+    # Parsing happens in a worker process so it never stalls the loop thread
+    with metrics.timer('parse_seconds'):
+        return await asyncio.get_running_loop().run_in_executor(get_parse_executor(), extract_workshop_links, page_source)
+
+async def iter_links_from_workshop(session, appid, search_term=None, limit=DEFAULT_SETTINGS['num_links_to_fetch']):
+    # Pages are fetched ahead of the consumer up to the concurrency limit but
+    # links are yielded in page order, the rest is cancelled once we have enough
+    if limit <= 0:
+        return
+    num_pages = (limit // LINKS_PER_PAGE) + 1
+    window = scheduler.max_concurrency
+    tasks = {}
+    next_page = 1
+    seen = set()
+    try:
+        for page in range(1, num_pages + 1):
+            while next_page <= num_pages and next_page < page + window:
+                tasks[next_page] = asyncio.ensure_future(fetch_browse_page(session, appid, next_page, search_term))
+                next_page += 1
+            links = await tasks.pop(page)
+            if links is None:
+                continue
+            if not links:
+                break
+            for link in links:
+                if link in seen:
+                    continue
+                seen.add(link)
+                yield link
+                if len(seen) >= limit:
+                    return
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+async def get_links_from_workshop(session, appid, search_term=None, limit=DEFAULT_SETTINGS['num_links_to_fetch']):
+    return [link async for link in iter_links_from_workshop(session, appid, search_term, limit)]
+
+async def fetch_workshop_item_details(session, item_id, refresh=False):
+    # Name, size, update date and preview image. The download link is only
+    # included when Steam hands it out, fetch_download_url finds the others.
+    # refresh skips the cached copy, for when a recent update must be seen.
+    key = f"details:{item_id}"
+    if not refresh:
+        return await metadata_cache.get_or_fetch(key, DETAILS_TTL, lambda: details_batcher.get(session, item_id))
+    details = await details_batcher.get(session, item_id)
+    if details is not None:
+        try:
+            await metadata_cache.put(key, details, DETAILS_TTL)
+        except sqlite3.Error:
+            pass
+    return details
+
+async def fetch_download_url(session, item_id):
+    key = f"url:{item_id}"
+    details = await metadata_cache.get_or_fetch(key, DOWNLOAD_URL_TTL, lambda: request_workshop_item_details(session, item_id))
+    return details['url'] if details else None
+
+class DetailsBatcher:
+    # Item ids asked for within BATCH_WINDOW of each other are resolved by a
+    # single GetPublishedFileDetails request instead of a ggntw call each.
+    # Must be used from the loop thread.
+    def __init__(self, window, max_size):
+        self.window = window
+        self.max_size = max_size
+        self.pending = {}  # Item id -> future of its details
+        self.timer = None
+        self.session = None
+
+    def get(self, session, item_id):
+        self.session = session
+        future = self.pending.get(item_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.pending[item_id] = future
+            if len(self.pending) >= self.max_size:
+                self.flush()
+            elif self.timer is None:
+                self.timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        # Shielded so one caller giving up does not fail the batch for the others
+        return asyncio.shield(future)
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, {}
+        if batch:
+            asyncio.ensure_future(self.resolve(self.session, batch))
+
+    async def resolve(self, session, batch):
+        try:
+            found = await request_published_file_details(session, list(batch))
+        except Exception:
+            found = None  # Unreachable or an answer we cannot read, same as a failed request
+        # Steam's API is unavailable or left some ids out of its answer, ask
+        # ggntw for each of those as before. Only an item Steam answered for
+        # with a failed result counts as broken.
+        missing = list(batch) if found is None else [item_id for item_id in batch if item_id not in found]
+        if missing:
+            results = await asyncio.gather(
+                *(request_workshop_item_details(session, item_id) for item_id in missing),
+                return_exceptions=True
+            )
+            found = found or {}
+            found.update(zip(missing, results))
+        metrics.count('details_batches_total')
+        metrics.count('details_batched_items_total', len(batch))
+        for item_id, future in batch.items():
+            if future.done():
+                continue
+            result = found.get(item_id)
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+async def request_published_file_details(session, item_ids):
+    # Details of many items in one request, None when the request failed
+    data = {'itemcount': len(item_ids)}
+    for index, item_id in enumerate(item_ids):
+        data[f'publishedfileids[{index}]'] = item_id
+    url = f"{STEAM_API_URL}/ISteamRemoteStorage/GetPublishedFileDetails/v1/"
+    async with scheduler.request(session, 'POST', url, data=data) as response:
+        if response.status != 200:
+            return None
+        payload = await response.json(content_type=None)
+    found = {}
+    for item in payload.get('response', {}).get('publishedfiledetails', []):
+        found[str(item.get('publishedfileid'))] = get_published_file_details(item)
+    return found
+
+def get_published_file_details(item):
+    # The same fields ggntw answers with, url is None when Steam leaves it out
+    if item.get('result') != 1:
+        return None
+    return {
+        'name': item.get('title') or 'unknown_item',
+        'size': format_size(int(item.get('file_size') or 0)),
+        'update': time.strftime("%d %b, %Y @ %I:%M%p", time.localtime(int(item.get('time_updated') or 0))),
+        'image': item.get('preview_url') or None,
+        'url': item.get('file_url') or None
+    }
+
+details_batcher = DetailsBatcher(BATCH_WINDOW, BATCH_SIZE)
+
+async def request_workshop_item_details(session, item_id):
+    url = get_item_url(item_id)
+    async with scheduler.request(
+        session,
+        'POST',
+        f"{GGNTW_URL}/steam.request",
+        json={"url": url},
+        headers={
+            "Content-Type": "application/json",
+            "User-Agent": "insomnia/2023.5.8"
+        }
+    ) as response:
+        if response.status == 200:
+            response_data = await response.json()
+            if 'url' in response_data:
+                return response_data
+    return None
+
+class DownloadError(Exception):
+    # transient is set when trying again later may succeed, status holds the
+    # HTTP status when the server refused the download
+    def __init__(self, message, transient=False, status=None):
+        super().__init__(message)
+        self.transient = transient
+        self.status = status
+
+# Where a finished download was saved, its size, the average transfer rate and
+# the SHA-256 of its content
+DownloadResult = namedtuple('DownloadResult', 'path size rate sha256')
+
+def format_size(num_bytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+def get_download_directory(download_directory=''):
+    if download_directory:
+        return download_directory
+    # Set default to user's Downloads directory if not set
+    return os.path.join(os.path.expanduser("~"), "Downloads")
+
+def get_part_path(directory, item_name):
+    # Where an unfinished download of item_name is kept
+    item_name = re.sub(r'[<>:"/\\|?*]', '_', item_name)
+    return os.path.join(get_download_directory(directory), item_name + '.part')
+
+def get_segments_path(part_path):
+    # Progress of a segmented download, next to its .part file
+    return part_path + '.segments'
+
+def get_validator_path(part_path):
+    # Which remote file a single-stream .part file holds the start of
+    return part_path + '.validator'
+
+def add_extension(item_name, content_type):
+    if '.' in item_name:
+        return item_name
+    if content_type == 'application/zip':
+        return item_name + '.zip'
+    elif content_type == 'application/octet-stream':
+        return item_name + '.bin'
+    return item_name + '.dat'
+
+def get_total_size(response, offset):
+    # For a 206 the total is after the slash in "bytes start-end/total"
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        if total.isdigit():
+            return int(total)
+    if response.content_length is not None:
+        return offset + response.content_length
+    return None
+
+def get_range_start(response):
+    # The first byte of a 206, None without a parsable Content-Range
+    match = re.match(r'bytes (\d+)-', response.headers.get('Content-Range', ''))
+    return int(match.group(1)) if match else None
+
+def get_validator(response, total):
+    # What a resume has to match: the ETag, unless weak as If-Range only
+    # takes a strong one, the modification date and the full size
+    etag = response.headers.get('ETag')
+    if etag and etag.startswith('W/'):
+        etag = None
+    return {'etag': etag, 'last_modified': response.headers.get('Last-Modified'), 'total': total}
+
+def matches_validator(response, offset, validator):
+    # A 206 continues the .part file only when it starts where the file ends
+    # and comes from the same remote file
+    if get_range_start(response) != offset:
+        return False
+    if validator['total'] is not None and get_total_size(response, offset) != validator['total']:
+        return False
+    etag = response.headers.get('ETag')
+    return not (validator['etag'] and etag and etag != validator['etag'])
+
+def hash_file(path, digest, limit=None):
+    # Feeds the first limit bytes of path into digest, all of it without a limit
+    with open(path, 'rb') as file:
+        while limit is None or limit > 0:
+            chunk = file.read(CHUNK_SIZE if limit is None else min(CHUNK_SIZE, limit))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if limit is not None:
+                limit -= len(chunk)
+    return digest
+
+class DigestSet:
+    # Several hashes fed the same data, so hash_file reads the file once
+    def __init__(self, names):
+        self.digests = {name: hashlib.new(name) for name in names}
+
+    def update(self, data):
+        for digest in self.digests.values():
+            digest.update(data)
+
+def get_expected_digests(headers):
+    # Hashes of the whole file the server vouches for: Content-MD5, the
+    # md5 and sha-256 of Repr-Digest or Digest, and md5 of x-goog-hash
+    expected = {}
+    values = [f"md5={headers['Content-MD5']}"] if 'Content-MD5' in headers else []
+    for name in ('Repr-Digest', 'Digest', 'x-goog-hash'):
+        values.extend(headers.get(name, '').split(','))
+    for value in values:
+        name, _, encoded = value.strip().partition('=')
+        name = DIGEST_NAMES.get(name.strip().lower())
+        if name is None or name in expected:
+            continue
+        try:
+            digest = base64.b64decode(encoded.strip().strip(':'), validate=True)
+        except ValueError:
+            continue
+        if len(digest) == hashlib.new(name).digest_size:
+            expected[name] = digest
+    return expected
+
+def write_chunk(file, digest, chunk):
+    digest.update(chunk)
+    file.write(chunk)
+
+class SegmentWriter:
+    # Writes at offsets of a file preallocated to its final size, with
+    # os.pwrite where there is one and through an mmap of the file elsewhere
+    # (Windows). Segments cover disjoint ranges so threads need no lock.
+    def __init__(self, path, size):
+        self.file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        try:
+            if os.fstat(self.file.fileno()).st_size != size:
+                self.file.truncate(size)
+                if hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(self.file.fileno(), 0, size)
+                    except OSError:
+                        pass  # Left sparse where the file system cannot reserve the space
+            self.map = None if hasattr(os, 'pwrite') else mmap.mmap(self.file.fileno(), size)
+        except BaseException:
+            self.file.close()
+            raise
+
+    def write(self, offset, data):
+        if self.map is not None:
+            self.map[offset:offset + len(data)] = data
+            return
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self.file.fileno(), view, offset)
+            view = view[written:]
+            offset += written
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+def read_segments(path, part_path):
+    # {'total': size, 'segments': [[next byte, end], ...]}, None without a
+    # usable file. The bytes it counts as done must still be in part_path,
+    # preallocated to the full size.
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            saved = json.load(file)
+        if os.path.getsize(part_path) != saved['total']:
+            return None
+        if all(0 <= position <= end <= saved['total'] for position, end in saved['segments']):
+            return saved
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+def read_validator(path):
+    # None without a usable file, the .part file then cannot be trusted
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            saved = json.load(file)
+        return {key: saved.get(key) for key in ('etag', 'last_modified', 'total')}
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def write_validator(path, validator):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(validator, file)
+    os.replace(temp_path, path)
+
+def write_segments(path, total, segments):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump({'total': total, 'segments': segments}, file)
+    os.replace(temp_path, path)
+
+def remove_partial(part_path):
+    # Drops an unfinished download and what was saved about its progress
+    for path in (part_path, get_segments_path(part_path), get_validator_path(part_path)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+async def probe_download(session, download_url):
+    # (size, content type, expected digests) when the server serves byte
+    # ranges of the file
+    try:
+        async with scheduler.request(session, 'HEAD', download_url, allow_redirects=True) as response:
+            if response.status != 200 or response.headers.get('Accept-Ranges', '').lower() != 'bytes':
+                return None
+            if not response.content_length:
+                return None
+            return response.content_length, response.headers.get('Content-Type'), get_expected_digests(response.headers)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+
+async def download_segmented(session, download_url, item_name, directory, part_path, segments, progress):
+    # Fetches byte ranges of the file over several connections at once and
+    # writes them in place. Returns None when the file is better fetched as
+    # a single stream: the server does not serve ranges, or it is too small.
+    running_loop = asyncio.get_running_loop()
+    segments_path = get_segments_path(part_path)
+    saved = await running_loop.run_in_executor(None, read_segments, segments_path, part_path)
+    if saved is None and os.path.exists(segments_path):
+        # Progress that does not match its .part file, trust neither
+        await running_loop.run_in_executor(None, remove_partial, part_path)
+    elif saved is None and os.path.exists(part_path):
+        return None  # Left by a single stream download, resumed as one
+    probe = await probe_download(session, download_url)
+    if saved is not None and (probe is None or probe[0] != saved['total']):
+        # The file changed since, or ranges are no longer served
+        await running_loop.run_in_executor(None, remove_partial, part_path)
+        saved = None
+    if probe is None:
+        return None
+    total, content_type, expected = probe
+    if saved is not None:
+        ranges = saved['segments']
+    else:
+        count = min(segments, total // SEGMENT_MIN_SIZE)
+        if count < 2:
+            return None
+        size = -(-total // count)
+        ranges = [[start, min(start + size, total)] for start in range(0, total, size)]
+    download_path = os.path.join(directory, add_extension(item_name, content_type))
+
+    def get_done():
+        return total - sum(end - position for position, end in ranges)
+
+    started = last_report = last_save = time.monotonic()
+    started_done = last_done = get_done()
+    saving = None
+
+    def on_chunk():
+        # Progress is reported and saved for all segments together
+        nonlocal last_report, last_done, last_save, saving
+        now = time.monotonic()
+        if progress and now - last_report >= PROGRESS_INTERVAL:
+            done = get_done()
+            progress(done, total, (done - last_done) / (now - last_report))
+            last_report = now
+            last_done = done
+        if now - last_save >= SEGMENTS_SAVE_INTERVAL and (saving is None or saving.done()):
+            last_save = now
+            # Positions only move once their bytes are written, a copy taken
+            # now never claims more than is in the file
+            saving = running_loop.run_in_executor(None, write_segments, segments_path, total, [list(segment) for segment in ranges])
+
+    async def fetch_segment(segment):
+        attempts = 0
+        while segment[0] < segment[1]:
+            try:
+                headers = {'Range': f"bytes={segment[0]}-{segment[1] - 1}"}
+                async with scheduler.request(session, 'GET', download_url, streamed=True, headers=headers) as response:
+                    if response.status != 206 or not response.headers.get('Content-Range', '').startswith(f"bytes {segment[0]}-"):
+                        raise DownloadError(
+                            f"Failed to download {item_name}: range {segment[0]}-{segment[1] - 1} refused",
+                            transient=response.status in RETRY_STATUSES,
+                            status=response.status
+                        )
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        chunk = chunk[:segment[1] - segment[0]]
+                        await running_loop.run_in_executor(None, metrics.timed, 'download_write_seconds', writer.write, segment[0], chunk)
+                        metrics.count('download_bytes_total', len(chunk))
+                        segment[0] += len(chunk)
+                        on_chunk()
+                        if segment[0] >= segment[1]:
+                            break
+                if segment[0] < segment[1]:
+                    raise aiohttp.ClientPayloadError(f"Connection closed at {segment[0]} of {segment[1]} bytes")
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Only this segment starts again, from where it stopped
+                attempts += 1
+                if attempts > MAX_RESUME_ATTEMPTS:
+                    raise DownloadError(f"Failed to download {item_name}: {e}", transient=True)
+                metrics.count('download_segment_retries_total')
+                await asyncio.sleep(min(2 ** attempts, 30))
+
+    def close_writer():
+        writer.close()
+        if get_done() < total:
+            write_segments(segments_path, total, ranges)
+
+    try:
+        writer = await running_loop.run_in_executor(None, SegmentWriter, part_path, total)
+        await running_loop.run_in_executor(None, write_segments, segments_path, total, ranges)
+    except PermissionError:
+        raise DownloadError(f"Permission denied: Cannot write to {part_path}.")
+    except OSError as e:
+        raise DownloadError(f"Failed to save {item_name}: {e}")
+
+    tasks = [asyncio.ensure_future(fetch_segment(segment)) for segment in ranges if segment[0] < segment[1]]
+    try:
+        if tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+    except OSError as e:
+        raise DownloadError(f"Failed to save {item_name}: {e}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if saving is not None:
+            await asyncio.gather(saving, return_exceptions=True)
+        await running_loop.run_in_executor(None, close_writer)
+
+    # Every byte was written where its Content-Range said. The file must come
+    # out at the advertised size and match every hash the server sent along,
+    # the sha256 is kept for the manifest either way.
+    try:
+        size = await running_loop.run_in_executor(None, os.path.getsize, part_path)
+        if size != total:
+            await running_loop.run_in_executor(None, remove_partial, part_path)
+            raise DownloadError(f"Downloaded {item_name} is {size} bytes instead of {total}", transient=True)
+        digests = await running_loop.run_in_executor(None, hash_file, part_path, DigestSet({'sha256', *expected}))
+        for name, value in expected.items():
+            if digests.digests[name].digest() != value:
+                await running_loop.run_in_executor(None, remove_partial, part_path)
+                metrics.count('download_verify_failures_total')
+                raise DownloadError(f"Downloaded {item_name} does not match the server's {name}", transient=True)
+        await running_loop.run_in_executor(None, os.replace, part_path, download_path)
+        await running_loop.run_in_executor(None, remove_partial, part_path)
+    except PermissionError:
+        raise DownloadError(f"Permission denied: Cannot write to {download_path}.")
+    except OSError as e:
+        raise DownloadError(f"Failed to save {item_name}: {e}")
+
+    elapsed = max(time.monotonic() - started, 1e-6)
+    return DownloadResult(download_path, total, (total - started_done) / elapsed, digests.digests['sha256'].hexdigest())
+
+async def download_workshop_item(session, download_url, item_name, download_directory='', progress=None, segments=1):
+    # Raises DownloadError when the item cannot be downloaded or saved. With
+    # segments above one a large file is fetched over that many connections.
+
+    # Remove or replace invalid characters
+    item_name = re.sub(r'[<>:"/\\|?*]', '_', item_name)
+
+    # Ensure the download directory exists
+    directory = get_download_directory(download_directory)
+    os.makedirs(directory, exist_ok=True)
+
+    # Data is streamed into a .part file which is renamed once complete, so a
+    # crash or dropped connection leaves something we can resume from
+    part_path = get_part_path(directory, item_name)
+    if segments > 1 or os.path.exists(get_segments_path(part_path)):
+        result = await download_segmented(session, download_url, item_name, directory, part_path, segments, progress)
+        if result is not None:
+            return result
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    running_loop = asyncio.get_running_loop()
+    validator_path = get_validator_path(part_path)
+    validator = None
+    if offset:
+        validator = await running_loop.run_in_executor(None, read_validator, validator_path)
+        if validator is None:
+            # Nothing tells which file the bytes came from, start over
+            await running_loop.run_in_executor(None, remove_partial, part_path)
+            offset = 0
+    download_path = None
+    total = None
+    attempts = 0
+    started = time.monotonic()
+    started_offset = offset
+
+    # The content is hashed as it is written. Only a resumed .part file is
+    # read back, its hash state did not survive the interruption.
+    digest = hashlib.sha256()
+    if offset:
+        try:
+            await running_loop.run_in_executor(None, hash_file, part_path, digest, offset)
+        except OSError as e:
+            raise DownloadError(f"Failed to read {part_path}: {e}")
+
+    while True:
+        headers = {}
+        if offset:
+            # If-Range makes the server send the whole file when it changed
+            headers['Range'] = f"bytes={offset}-"
+            if validator['etag'] or validator['last_modified']:
+                headers['If-Range'] = validator['etag'] or validator['last_modified']
+        try:
+            async with scheduler.request(session, 'GET', download_url, streamed=True, headers=headers) as response:
+                if offset and (response.status == 416 or (response.status == 206 and not matches_validator(response, offset, validator))):
+                    # The partial file no longer matches the remote one, start over
+                    await running_loop.run_in_executor(None, remove_partial, part_path)
+                    offset = started_offset = 0
+                    digest = hashlib.sha256()
+                    continue
+                if response.status not in (200, 206):
+                    raise DownloadError(
+                        f"Failed to download {item_name}",
+                        transient=response.status in RETRY_STATUSES,
+                        status=response.status
+                    )
+                if response.status == 200:
+                    # The server ignored the Range header and sent the whole file
+                    if offset:
+                        digest = hashlib.sha256()
+                    offset = started_offset = 0
+
+                if download_path is None:
+                    download_path = os.path.join(directory, add_extension(item_name, response.headers.get('Content-Type')))
+                total = get_total_size(response, offset)
+                if not offset:
+                    validator = get_validator(response, total)
+                    await running_loop.run_in_executor(None, write_validator, validator_path, validator)
+
+                file = await running_loop.run_in_executor(None, open, part_path, 'ab' if offset else 'wb')
+                try:
+                    last_report = time.monotonic()
+                    last_offset = offset
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        await running_loop.run_in_executor(None, metrics.timed, 'download_write_seconds', write_chunk, file, digest, chunk)
+                        metrics.count('download_bytes_total', len(chunk))
+                        offset += len(chunk)
+                        now = time.monotonic()
+                        if progress and now - last_report >= PROGRESS_INTERVAL:
+                            progress(offset, total, (offset - last_offset) / (now - last_report))
+                            last_report = now
+                            last_offset = offset
+                finally:
+                    await running_loop.run_in_executor(None, file.close)
+
+            if total is not None and offset < total:
+                raise aiohttp.ClientPayloadError(f"Connection closed at {offset} of {total} bytes")
+            break
+        except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            attempts += 1
+            if attempts > MAX_RESUME_ATTEMPTS:
+                raise DownloadError(f"Failed to download {item_name}: {e}", transient=True)
+            await asyncio.sleep(min(2 ** attempts, 30))
+        except PermissionError:
+            raise DownloadError(f"Permission denied: Cannot write to {part_path}.")
+        except OSError as e:
+            raise DownloadError(f"Failed to save {item_name}: {e}")
+
+    try:
+        await running_loop.run_in_executor(None, os.replace, part_path, download_path)
+        await running_loop.run_in_executor(None, remove_partial, part_path)
+    except PermissionError:
+        raise DownloadError(f"Permission denied: Cannot write to {download_path}.")
+
+    elapsed = max(time.monotonic() - started, 1e-6)
+    return DownloadResult(download_path, offset, (offset - started_offset) / elapsed, digest.hexdigest())
+
+def get_item_url(item_id):
+    return f"{ITEM_URL}{item_id}"
+
+def fetch_workshop_item_id(url):
+    match = WORKSHOP_ID_PATTERN.search(url)
+    if match:
+        return match.group(0)
+    else:
+        raise ValueError("CANNOT GET ID!")
+
+async def check_link(session, item_id):
+    item_details = await fetch_workshop_item_details(session, item_id)
+    if not item_details:
+        return False
+    return True
@@ -0,0 +1,476 @@
+# Download queue shared by the GUI and the CLI. Jobs are kept in a JSON
+# journal so queued and half finished downloads carry on after a restart,
+# the .part files left by download_workshop_item are resumed with Range.
+# Items already in the directory's manifest and not updated since are not
+# downloaded again. Finished .zip files may be unpacked in the background
+# while the workers carry on with the next downloads.
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+
+from workshop_core import (
+    DOWNLOAD_URL_TTL, DownloadError, DownloadResult, download_workshop_item, fetch_download_url,
+    fetch_workshop_item_details, get_download_directory, get_part_path, get_session, metadata_cache,
+    remove_partial, request_workshop_item_details
+)
+from workshop_extract import extract_archive, get_extract_directory, get_extract_executor, is_archive, shutdown_extract_executor
+from workshop_manifest import Manifest
+from workshop_metrics import metrics
+
+DOWNLOADS_FILE = 'downloads.json'  # Job journal, kept next to the settings file
+JOB_RETRIES = 3  # Retries for a job that failed with a transient error
+JOB_BACKOFF_BASE = 5  # Seconds before the first retry, doubled on every retry
+JOB_BACKOFF_MAX = 300  # Longest wait before a job is retried
+JOURNAL_INTERVAL = 1.0  # Seconds between journal writes while jobs change
+STALE_LINK_STATUSES = (401, 403, 404, 410)  # Statuses that mean the download link expired
+
+QUEUED = 'queued'
+RUNNING = 'running'
+EXTRACTING = 'extracting'  # Downloaded, being unpacked off the worker
+WAITING = 'waiting'  # Failed, queued again once its backoff has passed
+PAUSED = 'paused'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+PENDING_STATES = (QUEUED, RUNNING, WAITING, EXTRACTING)
+
+class DownloadJob:
+    def __init__(self, job_id, url, name, priority=0, item_id=None, directory=''):
+        self.job_id = job_id
+        self.url = url
+        self.name = name
+        self.priority = priority
+        self.item_id = item_id
+        self.directory = directory
+        self.state = QUEUED
+        self.attempts = 0
+        self.downloaded = 0
+        self.total = None
+        self.rate = 0.0
+        self.path = None
+        self.error = None
+        self.skipped = False  # Done without a download, the item had not changed
+        self.extracted = None  # Folder the download was unpacked into
+        self.extract_seconds = None
+        self.link_refreshed = False
+        self.requeue = False  # Resumed while its paused download was still stopping
+        self.task = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'url': self.url,
+            'name': self.name,
+            'priority': self.priority,
+            'item_id': self.item_id,
+            'directory': self.directory,
+            'state': self.state,
+            'attempts': self.attempts,
+            'downloaded': self.downloaded,
+            'total': self.total,
+            'path': self.path,
+            'error': self.error,
+            'skipped': self.skipped,
+            'extracted': self.extracted,
+            'extract_seconds': self.extract_seconds
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data['job_id'], data['url'], data['name'], data.get('priority', 0), data.get('item_id'), data.get('directory', ''))
+        job.state = data.get('state', QUEUED)
+        job.attempts = data.get('attempts', 0)
+        job.downloaded = data.get('downloaded', 0)
+        job.total = data.get('total')
+        job.path = data.get('path')
+        job.error = data.get('error')
+        job.skipped = data.get('skipped', False)
+        job.extracted = data.get('extracted')
+        job.extract_seconds = data.get('extract_seconds')
+        return job
+
+class DownloadManager:
+    # A fixed pool of workers takes the highest priority queued job. Must be
+    # used from the loop thread, other threads go through call_soon_threadsafe.
+    def __init__(self, journal_path=DOWNLOADS_FILE, workers=2, on_finished=None, segments=1, extract=False):
+        self.journal_path = journal_path  # None keeps the queue in memory only
+        self.workers = max(1, workers)
+        self.segments = max(1, segments)  # Connections per download for files large enough
+        self.extract = extract  # Unpack finished .zip downloads into a folder per item
+        self.on_finished = on_finished  # Called with each job that ends done or failed, once unpacked
+        self.jobs = {}
+        self.queue = []  # Heap of (-priority, sequence, job_id), stale entries are skipped
+        self.sequence = itertools.count()
+        self.next_id = 1
+        self.running_workers = 0
+        self.wakeup = None
+        self.idle = None
+        self.dirty = None
+        self.tasks = []
+        self.extractions = set()  # Tasks waiting on the extract process pool
+        self.manifests = {}  # Download directory -> Manifest
+
+    def load(self):
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return
+        for data in entries:
+            job = DownloadJob.from_dict(data)
+            if job.state in PENDING_STATES:
+                # Interrupted by the last shutdown, its .part file is resumed
+                job.state = QUEUED
+                self.push(job)
+            self.jobs[job.job_id] = job
+            self.next_id = max(self.next_id, job.job_id + 1)
+
+    async def start(self):
+        self.wakeup = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.dirty = asyncio.Event()
+        self.load()
+        self.update_idle()
+        self.tasks.append(asyncio.ensure_future(self.write_journal_loop()))
+        self.set_workers(self.workers)
+
+    async def stop(self):
+        # Jobs still extracting are unpacked again from their archive next launch
+        downloads = [job.task for job in self.jobs.values() if job.task is not None]
+        for task in (*self.tasks, *self.extractions):
+            task.cancel()
+        await asyncio.gather(*self.tasks, *downloads, *self.extractions, return_exceptions=True)
+        shutdown_extract_executor()
+        self.tasks = []
+        self.running_workers = 0
+        await asyncio.get_running_loop().run_in_executor(None, self.write_journal, self.journal_entries())
+
+    def set_workers(self, workers):
+        # Extra workers exit after their current job when the pool shrinks
+        self.workers = max(1, workers)
+        if self.wakeup is None:
+            return  # Not started yet, start() spawns the workers
+        while self.running_workers < self.workers:
+            self.running_workers += 1
+            self.tasks.append(asyncio.ensure_future(self.worker()))
+        self.wakeup.set()
+
+    def add(self, url, name, priority=0, item_id=None, directory=''):
+        job = DownloadJob(self.next_id, url, name, priority, item_id, directory)
+        self.next_id += 1
+        self.jobs[job.job_id] = job
+        self.push(job)
+        self.changed()
+        return job
+
+    def push(self, job):
+        heapq.heappush(self.queue, (-job.priority, next(self.sequence), job.job_id))
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def sync(self, item_ids=None, directory='', priority=0):
+        # Queues the items that changed since they were downloaded into
+        # directory, or were never downloaded there. Without item_ids every
+        # item in the directory's manifest is checked. Returns the new jobs.
+        running_loop = asyncio.get_running_loop()
+        manifest = self.get_manifest(directory)
+        if item_ids is None:
+            item_ids = await running_loop.run_in_executor(None, manifest.item_ids)
+        session = get_session()
+        # Fresh details, a cached update date may predate the last update
+        details = await asyncio.gather(
+            *(fetch_workshop_item_details(session, item_id, refresh=True) for item_id in item_ids),
+            return_exceptions=True
+        )
+        found = [
+            (item_id, item_details) for item_id, item_details in zip(item_ids, details)
+            if item_details and not isinstance(item_details, BaseException)
+        ]
+        changed = await running_loop.run_in_executor(
+            None, lambda: [(item_id, item_details) for item_id, item_details in found if not manifest.find_unchanged(item_id, item_details)]
+        )
+        return [
+            self.add(item_details.get('url'), item_details.get('name', 'unknown_item'), priority, item_id, directory)
+            for item_id, item_details in changed
+        ]
+
+    def get_manifest(self, directory):
+        directory = get_download_directory(directory)
+        manifest = self.manifests.get(directory)
+        if manifest is None:
+            manifest = self.manifests[directory] = Manifest(directory)
+        return manifest
+
+    def pause(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.state not in PENDING_STATES:
+            return
+        job.state = PAUSED
+        if job.task is not None:
+            job.task.cancel()  # The .part file stays for the resume
+        self.changed()
+
+    def resume(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.state not in (PAUSED, FAILED):
+            return
+        if job.state == FAILED:
+            job.attempts = 0
+        job.state = QUEUED
+        job.error = None
+        if job.task is not None:
+            job.requeue = True  # run_job queues it once the old download has stopped
+        else:
+            self.push(job)
+        self.changed()
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.state in (DONE, CANCELLED):
+            return
+        job.state = CANCELLED
+        if job.task is not None:
+            job.task.cancel()  # run_job removes the .part file once the download stopped
+        else:
+            asyncio.get_running_loop().run_in_executor(None, remove_partial, get_part_path(job.directory, job.name))
+        self.changed()
+
+    def set_priority(self, job_id, priority):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job.priority = priority
+        if job.state == QUEUED and job.task is None:
+            self.push(job)  # The old heap entry goes stale
+        self.changed()
+
+    def pause_all(self):
+        for job_id in list(self.jobs):
+            self.pause(job_id)
+
+    def resume_all(self):
+        for job in list(self.jobs.values()):
+            if job.state == PAUSED:
+                self.resume(job.job_id)
+
+    def clear_finished(self):
+        for job_id, job in list(self.jobs.items()):
+            if job.state in (DONE, CANCELLED):
+                del self.jobs[job_id]
+        self.changed()
+
+    async def join(self):
+        # Waits until no job is queued, running or waiting for a retry
+        await self.idle.wait()
+
+    def snapshot(self):
+        jobs = [job.to_dict() for job in self.jobs.values()]
+        for row, job in zip(jobs, self.jobs.values()):
+            row['rate'] = job.rate if job.state == RUNNING else 0.0
+        throughput = sum(row['rate'] for row in jobs)
+        return jobs, throughput
+
+    def changed(self):
+        self.update_idle()
+        if self.dirty is not None:
+            self.dirty.set()
+
+    def update_idle(self):
+        if self.idle is None:
+            return
+        if any(job.state in PENDING_STATES for job in self.jobs.values()):
+            self.idle.clear()
+        else:
+            self.idle.set()
+
+    async def next_job(self):
+        while True:
+            while self.queue:
+                _, _, job_id = heapq.heappop(self.queue)
+                job = self.jobs.get(job_id)
+                if job is not None and job.state == QUEUED and job.task is None:
+                    return job
+            self.wakeup.clear()
+            await self.wakeup.wait()
+
+    async def worker(self):
+        while True:
+            if self.running_workers > self.workers:
+                self.running_workers -= 1
+                return
+            job = await self.next_job()
+            if self.running_workers > self.workers:
+                self.push(job)
+                self.running_workers -= 1
+                return
+            await self.run_job(job)
+
+    async def run_job(self, job):
+        job.state = RUNNING
+        job.attempts += 1
+        job.error = None
+        job.skipped = False
+        job.extracted = job.extract_seconds = None
+        self.changed()
+
+        # Kept in a local, once job.task is cleared the job may be run again
+        task = job.task = asyncio.ensure_future(self.download(job))
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            # Shutting down, the job resumes from its .part file next launch
+            task.cancel()
+            job.state = QUEUED
+            raise
+        job.task = None
+        requeue, job.requeue = job.requeue, False
+        job.rate = 0.0
+        if task.cancelled():
+            # Paused or cancelled, pause(), cancel() or resume() already set the state
+            if job.state == CANCELLED:
+                await asyncio.get_running_loop().run_in_executor(None, remove_partial, get_part_path(job.directory, job.name))
+            elif requeue and job.state == QUEUED:
+                self.push(job)
+            return
+
+        error = task.exception()
+        if error is None:
+            result = task.result()
+            job.state = EXTRACTING if self.extract and is_archive(result.path) else DONE
+            job.path = result.path
+            job.downloaded = job.total = result.size
+            job.rate = result.rate
+        elif isinstance(error, DownloadError) and await self.refresh_link(job, error):
+            job.attempts -= 1
+            job.state = QUEUED
+            self.push(job)
+        elif getattr(error, 'transient', False) and job.attempts <= JOB_RETRIES:
+            job.state = WAITING
+            job.error = str(error)
+            delay = random.uniform(0.5, 1.0) * min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * 2 ** (job.attempts - 1))
+            asyncio.get_running_loop().call_later(delay, self.retry, job)
+        else:
+            job.state = FAILED
+            job.error = str(error)
+        self.changed()
+        if job.state == EXTRACTING:
+            task = asyncio.ensure_future(self.extract_job(job))
+            self.extractions.add(task)
+            task.add_done_callback(self.extractions.discard)
+        elif job.state in (DONE, FAILED) and self.on_finished:
+            self.on_finished(job)
+
+    async def extract_job(self, job):
+        running_loop = asyncio.get_running_loop()
+        target = get_extract_directory(job.path)
+        if job.skipped and await running_loop.run_in_executor(None, os.path.isdir, target):
+            result = None  # Unchanged and unpacked before
+        else:
+            try:
+                result = await running_loop.run_in_executor(get_extract_executor(), extract_archive, job.path, target)
+            except Exception as e:
+                # Resuming the job unpacks the archive again, its download is skipped
+                if job.state == EXTRACTING:
+                    job.state = FAILED
+                    job.error = f"Failed to extract {job.name}: {e}"
+                    self.changed()
+                    if self.on_finished:
+                        self.on_finished(job)
+                return
+            metrics.observe('extract_seconds', result.seconds)
+            metrics.count('extract_bytes_total', result.size)
+        if job.state != EXTRACTING:
+            return  # Paused or cancelled meanwhile
+        job.state = DONE
+        job.extracted = target
+        job.extract_seconds = result.seconds if result else None
+        self.changed()
+        if self.on_finished:
+            self.on_finished(job)
+
+    async def refresh_link(self, job, error):
+        # Download links handed out for an item expire, ask for a new one once
+        if job.link_refreshed or not job.item_id or error.status not in STALE_LINK_STATUSES:
+            return False
+        job.link_refreshed = True
+        try:
+            details = await request_workshop_item_details(get_session(), job.item_id)
+        except Exception:
+            return False
+        if not details or details['url'] == job.url:
+            return False
+        await metadata_cache.put(f"url:{job.item_id}", details, DOWNLOAD_URL_TTL)
+        job.url = details['url']
+        return True
+
+    def retry(self, job):
+        if job.state == WAITING:
+            job.state = QUEUED
+            self.push(job)
+            self.changed()
+
+    async def download(self, job):
+        def report_progress(downloaded, total, rate):
+            job.downloaded = downloaded
+            job.total = total
+            job.rate = rate
+
+        running_loop = asyncio.get_running_loop()
+        manifest = self.get_manifest(job.directory)
+        details = None
+        if job.item_id:
+            try:
+                details = await fetch_workshop_item_details(get_session(), job.item_id)
+            except Exception:
+                pass  # Without an update date the item is downloaded and recorded all the same
+            entry = await running_loop.run_in_executor(None, manifest.find_unchanged, job.item_id, details)
+            if entry is not None:
+                job.skipped = True
+                metrics.count('downloads_skipped_total')
+                return DownloadResult(manifest.get_file_path(entry), entry['size'], 0.0, entry['sha256'])
+
+        if not job.url:
+            # Queued from details without a link, only ggntw knows it
+            job.url = await fetch_download_url(get_session(), job.item_id) if job.item_id else None
+            if not job.url:
+                raise DownloadError(f"No download link for {job.name}")
+            self.changed()
+        with metrics.operation('download'):
+            result = await download_workshop_item(
+                get_session(), job.url, job.name, job.directory, progress=report_progress, segments=self.segments
+            )
+        if job.item_id:
+            try:
+                await running_loop.run_in_executor(None, manifest.record, job.item_id, details, result)
+            except OSError:
+                pass  # The file is saved, it is only downloaded again next time
+        return result
+
+    def journal_entries(self):
+        return [job.to_dict() for job in self.jobs.values()]
+
+    def write_journal(self, entries):
+        if not self.journal_path:
+            return
+        temp_path = self.journal_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(entries, file)
+        os.replace(temp_path, self.journal_path)
+
+    async def write_journal_loop(self):
+        running_loop = asyncio.get_running_loop()
+        while True:
+            await self.dirty.wait()
+            self.dirty.clear()
+            try:
+                await running_loop.run_in_executor(None, self.write_journal, self.journal_entries())
+            except OSError:
+                pass  # Try again on the next change
+            await asyncio.sleep(JOURNAL_INTERVAL)
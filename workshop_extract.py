@@ -0,0 +1,94 @@
+# Unpacks downloaded .zip files into a folder per item, next to the archive.
+# Runs in a process pool so extraction neither holds up the loop thread nor
+# competes for the GIL with the downloads still in flight. Kept free of
+# aiohttp and the GUI so the worker processes start quickly.
+
+import os
+import shutil
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+EXTRACT_WORKERS = 2  # Archives unpacked at the same time
+EXTRACT_CHUNK_SIZE = 1024 * 1024  # Bytes copied per read from an archive entry
+
+# Folder an archive was unpacked into, its file count, their total size and
+# the seconds it took
+ExtractResult = namedtuple('ExtractResult', 'path files size seconds')
+
+class ExtractError(Exception):
+    pass
+
+extract_executor = None
+
+def get_extract_executor():
+    global extract_executor
+    if extract_executor is None:
+        extract_executor = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+    return extract_executor
+
+def shutdown_extract_executor():
+    # An archive being unpacked is finished by its worker, the rest are dropped
+    global extract_executor
+    if extract_executor is not None:
+        extract_executor.shutdown(wait=False, cancel_futures=True)
+        extract_executor = None
+
+def is_archive(path):
+    return bool(path) and path.lower().endswith('.zip')
+
+def get_extract_directory(archive_path):
+    # "mods/Item 123.zip" unpacks into "mods/Item 123"
+    return os.path.splitext(archive_path)[0]
+
+def get_member_path(root, name):
+    # Where an archive entry belongs under root, None for a name that would
+    # land outside of it: absolute, with a drive or climbing up with .. A
+    # colon anywhere is refused too, on Windows it opens a drive or a stream.
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+    if not parts or name.startswith(('/', '\\')) or '..' in parts or any(':' in part for part in parts):
+        return None
+    path = os.path.join(root, *parts)
+    real_root = os.path.realpath(root)
+    try:
+        if os.path.commonpath([real_root, os.path.realpath(path)]) != real_root:
+            return None
+    except ValueError:
+        return None  # On another drive than root
+    return path
+
+def extract_archive(archive_path, target):
+    # Runs in a worker process. Entries are streamed to disk one at a time,
+    # into a temporary folder that replaces target once complete, so target
+    # only ever holds a whole archive.
+    started = time.perf_counter()
+    temp_path = target + '.extracting'
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+    files = 0
+    size = 0
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                path = get_member_path(temp_path, info.filename)
+                if path is None:
+                    raise ExtractError(f"{os.path.basename(archive_path)} has an entry outside its folder: {info.filename}")
+                if info.is_dir():
+                    os.makedirs(path, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with archive.open(info) as source, open(path, 'wb') as destination:
+                    shutil.copyfileobj(source, destination, EXTRACT_CHUNK_SIZE)
+                files += 1
+                size += info.file_size
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(temp_path, target)
+    except zipfile.BadZipFile as e:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise ExtractError(f"{os.path.basename(archive_path)} is not a valid zip file: {e}")
+    except BaseException:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+    return ExtractResult(target, files, size, time.perf_counter() - started)
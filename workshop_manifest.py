@@ -0,0 +1,100 @@
+# What has been downloaded into a directory: per item its update time, size,
+# file and content hash. Kept as a JSON file in the download directory so a
+# re-download of an unchanged item can be skipped, and files with the same
+# content are stored once as hard links to each other.
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from workshop_core import get_download_directory, hash_file
+from workshop_store import parse_update
+
+MANIFEST_FILE = 'workshop_manifest.json'  # In the download directory it describes
+
+class Manifest:
+    # Read and written from executor threads, which one is never known, so
+    # every method holds the lock. Paths are kept relative to the directory.
+    def __init__(self, directory):
+        self.directory = get_download_directory(directory)
+        self.path = os.path.join(self.directory, MANIFEST_FILE)
+        self.lock = threading.Lock()
+        self.items = None  # Item id -> entry, read on first use
+
+    def load(self):
+        if self.items is not None:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.items = json.load(file).get('items', {})
+        except (OSError, ValueError, AttributeError):
+            self.items = {}
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'items': self.items}, file, indent=1)
+        os.replace(temp_path, self.path)
+
+    def item_ids(self):
+        with self.lock:
+            self.load()
+            return list(self.items)
+
+    def find_unchanged(self, item_id, details):
+        # The entry of an item whose file is still there and which has not
+        # been updated since, None when it has to be downloaded
+        update = parse_update(details.get('update')) if details else None
+        if update is None:
+            return None
+        with self.lock:
+            self.load()
+            entry = self.items.get(str(item_id))
+        if not entry or entry.get('update') != update:
+            return None
+        try:
+            if os.path.getsize(self.get_file_path(entry)) != entry['size']:
+                return None
+        except OSError:
+            return None
+        return entry
+
+    def record(self, item_id, details, result):
+        # Adds a finished download. A file with the same content already in
+        # the directory replaces the new one with a hard link to it.
+        with self.lock:
+            self.load()
+            self.link_duplicate(result)
+            self.items[str(item_id)] = {
+                'name': details.get('name') if details else None,
+                'update': parse_update(details.get('update')) if details else None,
+                'size': result.size,
+                'path': os.path.relpath(result.path, self.directory),
+                'sha256': result.sha256,
+                'downloaded': time.time()
+            }
+            self.save()
+
+    def link_duplicate(self, result):
+        for entry in self.items.values():
+            if entry.get('sha256') != result.sha256 or entry.get('size') != result.size:
+                continue
+            existing = self.get_file_path(entry)
+            try:
+                if os.path.samefile(existing, result.path):
+                    return
+                # Only the candidate is read back, it may have been edited since
+                if hash_file(existing, hashlib.sha256()).hexdigest() != result.sha256:
+                    continue
+                temp_path = result.path + '.link'
+                os.link(existing, temp_path)
+                os.replace(temp_path, result.path)
+                return
+            except OSError:
+                continue  # Gone, or no hard links on this file system, keep the copy
+
+    def get_file_path(self, entry):
+        return os.path.join(self.directory, entry['path'])
@@ -0,0 +1,271 @@
+# Timings and counters for everything slow the app does: every HTTP request
+# (DNS, connect and TLS, time to headers, body bytes), browse page parsing,
+# thumbnail decoding, cache lookups and file writes. Exported as a JSON
+# snapshot or in the Prometheus text format, and optionally with a cProfile
+# dump per operation.
+#
+# Recording is cheap enough to stay on all the time and may happen from any
+# thread, the loop thread and the executors share one lock.
+
+import cProfile
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import aiohttp
+
+# Upper bounds in seconds, the last bucket takes everything slower
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+METRICS_PREFIX = 'workshop_'
+METRICS_FILE = 'metrics.json'  # Default export paths, next to the settings file
+PROMETHEUS_FILE = 'metrics.prom'
+PROFILE_DIR = 'profiles'  # One .prof file per profiled operation
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, share):
+        # Upper bound of the bucket holding the share, the max for the last one
+        if not self.count:
+            return 0.0
+        rank = share * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'max': self.max
+        }
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.counters = {}  # (name, labels) -> number
+        self.gauges = {}  # Name -> function returning a dict of numbers, read on export
+        self.profile_dir = None
+        self.profiling = False  # Only one cProfile may run at a time
+        self.profile_numbers = itertools.count(1)
+
+    def observe(self, name, seconds, labels=None):
+        key = (name, get_label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, value=1, labels=None):
+        key = (name, get_label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_gauges(self, name, collect):
+        self.gauges[name] = collect
+
+    @contextmanager
+    def timer(self, name, labels=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, labels)
+
+    def timed(self, name, func, *args):
+        # For run_in_executor, times func where it actually runs
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    @contextmanager
+    def operation(self, name):
+        # A user facing operation such as a search or a check. Timed always,
+        # and profiled when profiling is enabled. cProfile sees everything the
+        # thread runs meanwhile, other tasks on the loop included.
+        profiler = None
+        if self.profile_dir and not self.profiling:
+            self.profiling = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            with self.timer('operation_seconds', {'operation': name}):
+                yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self.profiling = False
+                self.dump_profile(profiler, name)
+
+    def enable_profiling(self, directory):
+        # None turns profiling off again
+        self.profile_dir = directory
+
+    def dump_profile(self, profiler, name):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self.profile_numbers)}.prof"))
+        except OSError:
+            pass  # A missing profile is not worth failing the operation for
+
+    def snapshot(self):
+        with self.lock:
+            histograms = [(name, dict(labels), histogram.to_dict()) for (name, labels), histogram in self.histograms.items()]
+            counters = [(name, dict(labels), value) for (name, labels), value in self.counters.items()]
+        return {
+            'time': time.time(),
+            'histograms': [{'name': name, 'labels': labels, **values} for name, labels, values in histograms],
+            'counters': [{'name': name, 'labels': labels, 'value': value} for name, labels, value in counters],
+            'gauges': self.collect_gauges()
+        }
+
+    def collect_gauges(self):
+        gauges = {}
+        for name, collect in self.gauges.items():
+            try:
+                gauges[name] = collect()
+            except Exception:
+                continue  # A broken collector should not break the export
+        return gauges
+
+    def to_prometheus(self):
+        with self.lock:
+            histograms = [(name, labels, list(histogram.counts), histogram.count, histogram.sum) for (name, labels), histogram in self.histograms.items()]
+            counters = list(self.counters.items())
+        lines = []
+        typed = set()
+        for name, labels, counts, count, total in sorted(histograms, key=get_sort_key):
+            metric = METRICS_PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket_count
+                bucket = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{metric}_bucket{format_labels(labels + (('le', bucket),))} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+        for (name, labels), value in sorted(counters, key=lambda item: get_sort_key(item[0])):
+            metric = METRICS_PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{format_labels(labels)} {value}")
+        for name, values in sorted(self.collect_gauges().items()):
+            for key, value in sorted(values.items()):
+                metric = METRICS_PREFIX + sanitize_name(f"{name}_{key}")
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, path):
+        write_atomic(path, json.dumps(self.snapshot(), indent=2))
+
+    def write_prometheus(self, path):
+        write_atomic(path, self.to_prometheus())
+
+def get_label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+def get_sort_key(item):
+    # Label values may mix numbers and strings, compare their text
+    return item[0], repr(item[1])
+
+def sanitize_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (key + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+def write_atomic(path, text):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+metrics = Metrics()
+
+def get_trace_config():
+    # Hooks on the shared session, each request gets its own context
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+        context.host = urlsplit(str(params.url)).hostname or ''
+        context.method = params.method
+
+    async def on_request_end(session, context, params):
+        labels = {'host': context.host, 'method': context.method, 'status': params.response.status}
+        # Time to response headers, the body is read by the caller afterwards
+        metrics.observe('http_request_seconds', time.perf_counter() - context.started, labels)
+        metrics.count('http_responses_total', 1, labels)
+
+    async def on_request_exception(session, context, params):
+        metrics.count('http_errors_total', 1, {'host': context.host, 'error': type(params.exception).__name__})
+
+    async def on_dns_resolvehost_start(session, context, params):
+        context.dns_started = time.perf_counter()
+
+    async def on_dns_resolvehost_end(session, context, params):
+        metrics.observe('dns_seconds', time.perf_counter() - context.dns_started, {'host': params.host})
+
+    async def on_dns_cache_hit(session, context, params):
+        metrics.count('dns_cache_hits_total', 1, {'host': params.host})
+
+    async def on_connection_create_start(session, context, params):
+        context.connect_started = time.perf_counter()
+
+    async def on_connection_create_end(session, context, params):
+        # TCP connect plus the TLS handshake for https
+        metrics.observe('connect_seconds', time.perf_counter() - context.connect_started, {'host': context.host})
+
+    async def on_connection_reuseconn(session, context, params):
+        metrics.count('connections_reused_total', 1, {'host': context.host})
+
+    async def on_response_chunk_received(session, context, params):
+        # Only bodies read whole, streamed downloads count their own bytes
+        metrics.count('http_received_bytes_total', len(params.chunk), {'host': context.host})
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_response_chunk_received.append(on_response_chunk_received)
+    return trace_config
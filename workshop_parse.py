@@ -0,0 +1,95 @@
+from html.parser import HTMLParser
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Only the first div.workshopBrowseItems on a browse page matters, and from it
+# the href of the first link inside every div carrying a data-panel attribute
+CONTAINER_CLASS = 'workshopBrowseItems'
+CONTAINER_XPATH = f"//div[contains(concat(' ', normalize-space(@class), ' '), ' {CONTAINER_CLASS} ')]"
+
+class StopParsing(Exception):
+    pass
+
+class BrowseItemsParser(HTMLParser):
+    # Streaming tokenizer that builds no tree, it only counts div nesting inside
+    # the container and stops feeding once the container is closed
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.depth = 0  # Div depth inside the container, 0 while outside it
+        self.panels = []  # [div depth, href] per data-panel div in document order
+        self.open_panels = []  # Indexes of panels still waiting for their first link
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'div':
+            if self.depth:
+                self.depth += 1
+                if any(name == 'data-panel' for name, value in attrs):
+                    self.open_panels.append(len(self.panels))
+                    self.panels.append([self.depth, None])
+            elif CONTAINER_CLASS in (dict(attrs).get('class') or '').split():
+                self.depth = 1
+        elif tag == 'a' and self.open_panels:
+            href = dict(attrs).get('href')
+            for index in self.open_panels:
+                self.panels[index][1] = href
+            self.open_panels = []
+
+    def handle_endtag(self, tag):
+        if tag != 'div' or not self.depth:
+            return
+        self.open_panels = [index for index in self.open_panels if self.panels[index][0] < self.depth]
+        self.depth -= 1
+        if not self.depth:
+            raise StopParsing()
+
+def extract_links_stream(html):
+    parser = BrowseItemsParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except StopParsing:
+        pass
+    return [href for depth, href in parser.panels if href]
+
+def extract_links_lxml(html):
+    containers = lxml.html.fromstring(html).xpath(CONTAINER_XPATH)
+    if not containers:
+        return []
+    links = []
+    for div in containers[0].iterdescendants('div'):
+        if div.get('data-panel') is not None:
+            link = next(div.iterdescendants('a'), None)
+            if link is not None and link.get('href'):
+                links.append(link.get('href'))
+    return links
+
+def extract_links_soup(html):
+    # The original full tree parse, kept as the fallback
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    workshop_div = soup.find('div', class_=CONTAINER_CLASS)
+    if not workshop_div:
+        return []
+    links = []
+    for div in workshop_div.find_all('div', attrs={'data-panel': True}):
+        link = div.find('a')
+        if link and link.get('href'):
+            links.append(link['href'])
+    return links
+
+def extract_workshop_links(html):
+    # Runs in a worker process, so it must stay importable without the GUI
+    try:
+        if lxml is not None:
+            links = extract_links_lxml(html)
+        else:
+            links = extract_links_stream(html)
+    except Exception:
+        return extract_links_soup(html)
+    if not links and CONTAINER_CLASS in html and 'data-panel' in html:
+        # The fast path found nothing on a page that looks like it has items
+        return extract_links_soup(html)
+    return links
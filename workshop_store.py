@@ -0,0 +1,147 @@
+# Search results kept as item ids instead of link strings. The links are
+# rebuilt from the id when a row is shown, so a result set of 100k items
+# costs an 8 byte array slot and a dict entry per item.
+
+import re
+import time
+from array import array
+
+from workshop_core import get_item_url
+
+SORT_FOUND = 'found'
+SORT_SIZE = 'size'
+SORT_UPDATE = 'update'
+
+SIZE_PATTERN = re.compile(r"([0-9][0-9,]*(?:\.[0-9]+)?)\s*([KMGT]?i?B)\b", re.IGNORECASE)
+SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+# Steam leaves the year out for dates in the current year
+UPDATE_FORMATS = ("%d %b, %Y @ %I:%M%p", "%b %d, %Y @ %I:%M%p", "%d %b @ %I:%M%p", "%b %d @ %I:%M%p", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+def parse_size(text):
+    # "12.5 MB" -> bytes, None when there is no size in the text
+    match = SIZE_PATTERN.search(str(text or ''))
+    if not match:
+        return None
+    unit = match.group(2).upper().replace('I', '')
+    return int(float(match.group(1).replace(',', '')) * SIZE_UNITS[unit])
+
+def parse_update(text):
+    # Workshop update date -> timestamp, None when it cannot be read
+    text = ' '.join(str(text or '').split())
+    for date_format in UPDATE_FORMATS:
+        try:
+            parsed = time.strptime(text, date_format)
+        except ValueError:
+            continue
+        if '%Y' not in date_format:
+            parsed = time.strptime(f"{text} {time.localtime().tm_year}", date_format + " %Y")
+        return time.mktime(parsed)
+    return None
+
+class ResultStore:
+    # Only touched from the Tk thread. view holds the ids shown after
+    # filtering and sorting and is the ids array itself when neither applies.
+    def __init__(self):
+        self.ids = array('Q')  # In the order they were found
+        self.positions = {}  # Item id -> index in ids, also the dedupe set
+        self.details = {}  # Item id -> details, for the items fetched so far
+        self.sizes = {}  # Item id -> size in bytes, parsed once from the details
+        self.updates = {}  # Item id -> update timestamp, parsed once from the details
+        self.view = self.ids
+        self.filter_text = ''
+        self.sort_key = SORT_FOUND
+        self.descending = False
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return int(item_id) in self.positions
+
+    def clear(self):
+        self.ids = array('Q')
+        self.positions.clear()
+        self.details.clear()
+        self.sizes.clear()
+        self.updates.clear()
+        self.apply()  # Empty, but still filtered and sorted like before
+
+    def add(self, item_ids):
+        # Returns how many of the ids were new
+        added = 0
+        for item_id in map(int, item_ids):
+            if item_id in self.positions:
+                continue
+            self.positions[item_id] = len(self.ids)
+            self.ids.append(item_id)
+            if self.view is not self.ids and self.matches(item_id):
+                self.view.append(item_id)  # Sorted into place on the next apply()
+            added += 1
+        return added
+
+    def remove(self, item_ids):
+        removed = {int(item_id) for item_id in item_ids} & self.positions.keys()
+        if not removed:
+            return 0
+        self.ids = array('Q', (item_id for item_id in self.ids if item_id not in removed))
+        self.positions = {item_id: index for index, item_id in enumerate(self.ids)}
+        for item_id in removed:
+            self.details.pop(item_id, None)
+            self.sizes.pop(item_id, None)
+            self.updates.pop(item_id, None)
+        self.apply()
+        return len(removed)
+
+    def set_details(self, item_id, details):
+        item_id = int(item_id)
+        if item_id not in self.positions or not details:
+            return
+        self.details[item_id] = details
+        size = parse_size(details.get('size'))
+        if size is not None:
+            self.sizes[item_id] = size
+        update = parse_update(details.get('update'))
+        if update is not None:
+            self.updates[item_id] = update
+
+    def missing_details(self):
+        return [item_id for item_id in self.ids if item_id not in self.details]
+
+    def apply(self, filter_text=None, sort_key=None, descending=None):
+        # Rebuilds the view, arguments left as None keep their current value
+        if filter_text is not None:
+            self.filter_text = filter_text.strip().lower()
+        if sort_key is not None:
+            self.sort_key = sort_key
+        if descending is not None:
+            self.descending = descending
+        if not self.filter_text and self.sort_key == SORT_FOUND and not self.descending:
+            self.view = self.ids
+            return
+        shown = [item_id for item_id in self.ids if self.matches(item_id)] if self.filter_text else list(self.ids)
+        if self.sort_key != SORT_FOUND:
+            values = self.sizes if self.sort_key == SORT_SIZE else self.updates
+            # Items without a known value stay at the end in either direction
+            known = [item_id for item_id in shown if item_id in values]
+            unknown = [item_id for item_id in shown if item_id not in values]
+            known.sort(key=values.__getitem__, reverse=self.descending)
+            shown = known + unknown
+        elif self.descending:
+            shown.reverse()
+        self.view = array('Q', shown)
+
+    def matches(self, item_id):
+        if not self.filter_text:
+            return True
+        if self.filter_text in str(item_id):
+            return True
+        details = self.details.get(item_id)
+        return bool(details) and self.filter_text in str(details.get('name', '')).lower()
+
+    def row(self, index):
+        # Item id and text of the row at index of the view
+        item_id = self.view[index]
+        details = self.details.get(item_id)
+        if details and details.get('name'):
+            return item_id, f"{details['name']}  ({details.get('size', '?')})  {get_item_url(item_id)}"
+        return item_id, get_item_url(item_id)